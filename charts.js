@@ -21,13 +21,49 @@ document.addEventListener("DOMContentLoaded", () => {
     updateChart(transformedData);
   });
 
-  function fetchDataAndUpdateChart(timeRange, region) {
-    //const endpoint = `https://backend.koodattu.dev/api/data/history/${timeRange}`;
-    const endpoint = `./data/history_${timeRange}.json`;
+  // Set to the backend history endpoint to cache history locally and only fetch new points
+  const historyApiBase = null; // "https://backend.koodattu.dev/api/data/history"
+  const periodLengths = { month: 30 * 24 * 60 * 60 * 1000, week: 7 * 24 * 60 * 60 * 1000, day: 24 * 60 * 60 * 1000 };
+
+  function loadHistory(timeRange) {
+    if (!historyApiBase) {
+      return fetch(`./data/history_${timeRange}.json`).then((response) => response.json());
+    }
+    return syncHistory(timeRange);
+  }
+
+  function syncHistory(timeRange) {
+    const storageKey = `history_${timeRange}`;
+    const stored = JSON.parse(localStorage.getItem(storageKey) || "null") || { cursor: 0, data: [] };
+    return fetch(`${historyApiBase}/${timeRange}?since=${encodeURIComponent(stored.cursor)}`)
+      .then((response) => response.json())
+      .then((delta) => {
+        const data = mergeHistory(stored.data, delta.data, timeRange);
+        try {
+          localStorage.setItem(storageKey, JSON.stringify({ cursor: delta.cursor, data: data }));
+        } catch (e) {
+          // Storage is full, the full history is synced again on the next visit
+        }
+        return data;
+      });
+  }
+
+  function mergeHistory(data, newData, timeRange) {
+    // Points that fell out of the selected period are dropped
+    const oldestTimestamp = periodLengths[timeRange] ? Date.now() - periodLengths[timeRange] : null;
+    return newData.map((region) => {
+      const existing = data.find((item) => item.region === region.region);
+      let points = (existing ? existing.data : []).concat(region.data);
+      if (oldestTimestamp !== null) {
+        points = points.filter((point) => point.timestamp >= oldestTimestamp);
+      }
+      return { region: region.region, data: points };
+    });
+  }
 
+  function fetchDataAndUpdateChart(timeRange, region) {
     if (!cachedData[timeRange]) {
-      fetch(endpoint)
-        .then((response) => response.json())
+      loadHistory(timeRange)
         .then((data) => {
           cachedData[timeRange] = data; // Cache the fetched data
           const transformedData = transformDataForChart(data, region); // Transform the data for the chart
@@ -0,0 +1,69 @@
+from collections import defaultdict
+import json
+
+# Week 0 holds the characters that have not acquired the weapon yet, acquisition weeks start at 1
+DIMENSIONS = ('region', 'class', 'week', 'kills_hc', 'kills_m')
+NUMERIC_DIMENSIONS = ('week', 'kills_hc', 'kills_m')
+
+class AcquisitionCube:
+    """
+    Sparse count cube of the tracked characters over region, class, acquisition week and heroic/mythic kills.
+    It is filled in the same pass as the acquisition summary and answers any slice or roll-up in memory.
+    """
+    def __init__(self, cells=None):
+        self.cells = defaultdict(int, cells or {})
+
+    def add(self, region, class_name, week, kills_hc, kills_m):
+        self.cells[(region, class_name, week, kills_hc, kills_m)] += 1
+
+    def query(self, filters=None, group_by=()):
+        """
+        Rolls the cube up to the group_by dimensions over the cells matching filters, a dict of dimension to allowed values.
+        Returns a list of the group's dimension values and their character count.
+        """
+        for dimension in list(filters or {}) + list(group_by):
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown cube dimension: {dimension}")
+        filters = [(DIMENSIONS.index(dimension), set(values)) for dimension, values in (filters or {}).items()]
+        group_indexes = [DIMENSIONS.index(dimension) for dimension in group_by]
+
+        totals = defaultdict(int)
+        for cell, count in self.cells.items():
+            if all(cell[index] in allowed for index, allowed in filters):
+                totals[tuple(cell[index] for index in group_indexes)] += count
+        return [{**dict(zip(group_by, key)), 'count': count} for key, count in sorted(totals.items())]
+
+    def to_document(self):
+        """Packs the cells into rows of dimension values followed by the count."""
+        return {'dimensions': list(DIMENSIONS), 'cells': [[*cell, count] for cell, count in sorted(self.cells.items())]}
+
+    @classmethod
+    def from_document(cls, document):
+        if document is None:
+            return cls()
+        return cls({tuple(row[:-1]): row[-1] for row in document['cells']})
+
+def parse_cube_query(args):
+    """
+    Reads a cube query from request arguments: 'group_by' is a comma separated list of dimensions,
+    every other dimension argument a comma separated list of allowed values. Raises ValueError if invalid.
+    """
+    group_by = [dimension for dimension in args.get('group_by', '').split(',') if dimension]
+    for dimension in group_by:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown cube dimension: {dimension}")
+    filters = {}
+    for dimension in DIMENSIONS:
+        if dimension not in args:
+            continue
+        values = args[dimension].split(',')
+        if dimension in NUMERIC_DIMENSIONS:
+            if not all(value.isdigit() for value in values):
+                raise ValueError(f"Cube dimension {dimension} only has numeric values")
+            values = [int(value) for value in values]
+        filters[dimension] = values
+    return filters, group_by
+
+def load_cube_payload(payload):
+    """Parses a serialized cube, callers keep the result as long as the payload is unchanged."""
+    return AcquisitionCube.from_document(json.loads(payload))
@@ -1,14 +1,11 @@
 from datetime import datetime
 from mongodb_manager import MongoDBManager
+from acquisition_cube import AcquisitionCube
 
 class AcquisitionDataAggregator:
     def aggregate_data(self):
-        db_manager = MongoDBManager()
+        db_manager = MongoDBManager(workload='ingest')
         collections = ['chars_death-knight', 'chars_paladin', 'chars_warrior']
-        data = {}
-        for collection in collections:
-            docs = db_manager.db[collection].find({})
-            data[collection] = list(docs)
     
         meeressteel_timestamp = 1701193528
         meeressteel_date = datetime.utcfromtimestamp(meeressteel_timestamp)
@@ -30,6 +27,7 @@ class AcquisitionDataAggregator:
         }
         daily_acquisitions = {}
         cumulative_acquisitions = {}
+        cube = AcquisitionCube()
 
         for collection in collections:
             docs = db_manager.db[collection].find({})
@@ -44,6 +42,7 @@ class AcquisitionDataAggregator:
                     summary['total']['false'] += 1
                     summary['kills_summary']['chars_without_weapon_hc'][str(kills_hc)] += 1
                     summary['kills_summary']['chars_without_weapon_m'][str(kills_m)] += 1
+                    cube.add(doc.get('region'), class_name, 0, kills_hc, kills_m)
                 else:
                     summary[class_name]['true'] += 1
                     summary['total']['true'] += 1
@@ -53,6 +52,7 @@ class AcquisitionDataAggregator:
                     kills_m = min(kills_m, weeks_since_acquisition)
                     summary['kills_summary']['chars_with_weapon_hc'][str(kills_hc)] += 1
                     summary['kills_summary']['chars_with_weapon_m'][str(kills_m)] += 1
+                    cube.add(doc.get('region'), class_name, weeks_since_acquisition, kills_hc, kills_m)
                     
                     date = datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d')
                     if date not in daily_acquisitions:
@@ -68,12 +68,13 @@ class AcquisitionDataAggregator:
             cumulative_counts['total'] += daily_acquisitions[date]['total']
             cumulative_acquisitions[date] = cumulative_counts.copy()
 
-        self.update_database_with_aggregated_data(db_manager, summary, daily_acquisitions, cumulative_acquisitions)
+        self.update_database_with_aggregated_data(db_manager, summary, daily_acquisitions, cumulative_acquisitions, cube)
 
-    def update_database_with_aggregated_data(self, db_manager, summary, daily_acquisitions, cumulative_acquisitions):
+    def update_database_with_aggregated_data(self, db_manager, summary, daily_acquisitions, cumulative_acquisitions, cube):
         # Ensure only the latest summary document exists
         db_manager.db['acquisitions_summary'].delete_many({})
         db_manager.db['acquisitions_summary'].insert_one(summary)
+        db_manager.db['acquisitions_cube'].replace_one({'_id': 'cube'}, cube.to_document(), upsert=True)
 
         # Sort the dates in ascending order for both daily and cumulative acquisitions
         sorted_daily_dates = sorted(daily_acquisitions.keys())
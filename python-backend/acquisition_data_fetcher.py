@@ -2,12 +2,13 @@ import sys
 import time
 import os
 import json
-import requests
+import upstream_http
 from dotenv import load_dotenv
 import base64
 
 from mongodb_manager import MongoDBManager
 from acquisition_data_aggregator import AcquisitionDataAggregator
+from item_catalog import FYRALATH_ID
 
 # Define constants
 CLASSES = ["death-knight", "paladin", "warrior"]
@@ -24,17 +25,15 @@ BLIZZARD_ACH_API = "https://{region}.api.blizzard.com/profile/wow/character/{rea
 BLIZZARD_RAIDS_API = "https://{region}.api.blizzard.com/profile/wow/character/{realm}/{name}/encounters/raids"
 
 def is_wearing_fyrath_by_item_id_rio(character_gear):
-    fyralath_item_id = 206448
     try:
         main_hand_item = character_gear.get('gear', {}).get('items', {}).get('mainhand', {})
-        return main_hand_item.get('item_id') == fyralath_item_id
+        return main_hand_item.get('item_id') == FYRALATH_ID
     except Exception:
         return False
     
 def is_wearing_fyrath_by_item_id_blizz(character_gear):
-    fyrath_item_id = 206448
     for item in character_gear.get('equipped_items', []):
-        if item.get('item', {}).get('id') == fyrath_item_id:
+        if item.get('item', {}).get('id') == FYRALATH_ID:
             return True
     return False
 
@@ -59,7 +58,7 @@ def get_access_token():
     data = {'grant_type': 'client_credentials'}
     headers = {'Authorization': f'Basic {base64_encoded_credentials}'}
     try:
-        response = requests.post(token_url, data=data, headers=headers)
+        response = upstream_http.post(token_url, data=data, headers=headers)
         response.raise_for_status()
         return response.json()['access_token']
     except Exception as e:
@@ -75,7 +74,7 @@ def make_blizz_request(access_token, api, region, realm, name):
         'access_token': access_token
     }
     try:
-        response = requests.get(url, params=params)
+        response = upstream_http.get(url, params=params)
         if response.status_code == 200:
             return response.json()
         else:
@@ -90,7 +89,7 @@ def make_blizz_request(access_token, api, region, realm, name):
 def make_rio_request(url):
     """Make an HTTP GET request and return the JSON response. Logs failures."""
     try:
-        response = requests.get(url)
+        response = upstream_http.get(url)
         if response.status_code == 200:
             return response.json()
         else:
@@ -104,7 +103,7 @@ def make_rio_request(url):
 
 class AcquisitionDataFetcher:
     def fetch_and_process_characters(self):
-        mongo_db_manager = MongoDBManager()
+        mongo_db_manager = MongoDBManager(workload='ingest')
         saved_character_ids, saved_characters_per_class = mongo_db_manager.get_saved_character_ids_with_class()
         request_count = 0
         character_count = sum(len(ids) for ids in saved_character_ids.values())
@@ -197,8 +196,9 @@ class AcquisitionDataFetcher:
 
     def update_characters_data(self):
         access_token = get_access_token()
-        mongo_db_manager = MongoDBManager()
+        mongo_db_manager = MongoDBManager(workload='ingest')
         characters_to_update = mongo_db_manager.get_characters_without_fyralath()
+        updated_characters = 0
         for class_name, characters in characters_to_update.items():
             for char in characters:
                 char_id = char['char_id']
@@ -244,10 +244,13 @@ class AcquisitionDataFetcher:
                         "fyrakk_kills_m": fyrakk_kills_m
                     }
                     mongo_db_manager.update_character(class_name, char_id, updates)
+                    updated_characters += 1
                     print(f"Character {name} on {realm} updated.")
                 else:
                     print(f"Character {name} on {realm} did not have any new data.")
 
+        return updated_characters
+
 if __name__ == "__main__":
     fetcher = AcquisitionDataFetcher()
     #fetcher.fetch_and_process_characters()
@@ -0,0 +1,72 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import time
+import numpy as np
+import requests
+
+DEFAULT_PATHS = [
+    '/api/data/current',
+    '/api/data/history/all',
+    '/api/data/history/week',
+    '/api/data/acquisitions'
+]
+
+def run_worker(url, deadline):
+    """Requests the url in a loop until the deadline, returning the latencies in seconds and the error count."""
+    session = requests.Session()
+    latencies = []
+    errors = 0
+    while time.perf_counter() < deadline:
+        start_time = time.perf_counter()
+        try:
+            response = session.get(url)
+            response.content
+            if response.status_code != 200:
+                errors += 1
+                continue
+        except requests.RequestException:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start_time)
+    return latencies, errors
+
+def load_test(url, concurrency, duration):
+    """Runs a closed-loop load test with the given number of concurrent clients against a single url."""
+    # Warm up the server side caches so the first misses do not dominate the percentiles
+    requests.get(url)
+    deadline = time.perf_counter() + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: run_worker(url, deadline), range(concurrency)))
+
+    latencies = np.array([latency for worker_latencies, _ in results for latency in worker_latencies])
+    errors = sum(worker_errors for _, worker_errors in results)
+    if latencies.size == 0:
+        return {'requests': 0, 'errors': errors, 'rps': 0.0, 'p50': None, 'p99': None}
+    return {
+        'requests': int(latencies.size),
+        'errors': errors,
+        'rps': latencies.size / duration,
+        'p50': float(np.percentile(latencies, 50) * 1000),
+        'p99': float(np.percentile(latencies, 99) * 1000)
+    }
+
+def format_ms(value):
+    return f"{value:.1f}" if value is not None else "-"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare API deployments, e.g. waitress against the ASGI app.")
+    parser.add_argument('--target', action='append', required=True,
+                        help="name=base_url, e.g. waitress=http://localhost:5000 asgi=http://localhost:8000")
+    parser.add_argument('--path', action='append', help="API path to test, defaults to every data endpoint")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    targets = [target.split('=', 1) for target in args.target]
+    paths = args.path or DEFAULT_PATHS
+
+    print(f"{'target':<10} {'path':<28} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, base_url in targets:
+        for path in paths:
+            result = load_test(base_url.rstrip('/') + path, args.concurrency, args.duration)
+            print(f"{name:<10} {path:<28} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} {format_ms(result['p50']):>8} {format_ms(result['p99']):>8}")
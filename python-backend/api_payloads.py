@@ -0,0 +1,91 @@
+import json
+from item_catalog import DEFAULT_RECIPE
+
+# Long periods are served from daily averages, short ones from the hourly total costs
+DAILY_AVERAGE_PERIODS = ("all", "month")
+HISTORY_PERIODS = ("all", "month", "week", "day")
+
+def format_current_payload(latest, recipe):
+    """
+    Serializes the latest item prices document, keeping only the requested recipe under the 'data' key the website reads.
+    Documents saved before recipes were tracked only have the default recipe's 'data'.
+    """
+    if latest is not None:
+        recipes = latest.get('recipes', {DEFAULT_RECIPE: latest.get('data', [])})
+        latest = {'_id': latest.get('snapshot_id', latest.get('_id')), 'timestamp': latest['timestamp'], 'sampled_at': latest.get('sampled_at'), 'data': recipes.get(recipe, [])}
+    return json.dumps(latest, default=str)
+
+def diff_current_payloads(previous, latest):
+    """
+    Returns the compact difference between two current payloads per region: the prices, by item ID, and token ratios
+    that changed, the full items that were added and the IDs of removed items. Added regions are sent whole,
+    removed regions by name.
+    """
+    previous_regions = {region['region']: region for region in (previous or {}).get('data', [])}
+    regions = {}
+    for region in latest.get('data', []):
+        previous_region = previous_regions.pop(region['region'], None)
+        if previous_region is None:
+            regions[region['region']] = {'region': region}
+            continue
+        previous_prices = {item['id']: item['price'] for item in previous_region['items']}
+        changes = {}
+        changed_items = {str(item['id']): item['price'] for item in region['items']
+                         if item['id'] in previous_prices and previous_prices[item['id']] != item['price']}
+        if changed_items:
+            changes['items'] = changed_items
+        added_items = [item for item in region['items'] if item['id'] not in previous_prices]
+        if added_items:
+            changes['added_items'] = added_items
+        latest_ids = {item['id'] for item in region['items']}
+        removed_items = [item_id for item_id in previous_prices if item_id not in latest_ids]
+        if removed_items:
+            changes['removed_items'] = removed_items
+        if previous_region.get('wow_token_ratio') != region.get('wow_token_ratio'):
+            changes['wow_token_ratio'] = region.get('wow_token_ratio')
+        if changes:
+            regions[region['region']] = changes
+    return {'_id': latest.get('_id'), 'timestamp': latest.get('timestamp'), 'sampled_at': latest.get('sampled_at'),
+            'regions': regions, 'removed_regions': list(previous_regions)}
+
+def format_history_payload(history):
+    return json.dumps(history, default=str)
+
+def parse_history_cursor(since):
+    """
+    Parses the 'since' argument of a history delta request, a timestamp or a cursor of a previous delta response.
+    Raises ValueError if it is neither.
+    """
+    if since.isdigit():
+        return int(since)
+    cursor = {}
+    for region_cursor in since.split(','):
+        region, _, timestamp = region_cursor.partition(':')
+        if not region or not timestamp.isdigit():
+            raise ValueError(f"Invalid history cursor: {since}")
+        cursor[region] = int(timestamp)
+    return cursor
+
+def format_history_delta_payload(history, since):
+    """
+    Serializes the history entries newer than since with the cursor to pass as since on the next sync.
+    The cursor keeps the newest timestamp of every region, so a region written after the others in the same hour is not skipped.
+    """
+    region_cursors = []
+    for region in history:
+        region_since = since.get(region['region'], 0) if isinstance(since, dict) else since
+        newest = max((document['timestamp'] for document in region['data']), default=region_since)
+        region_cursors.append(f"{region['region']}:{newest}")
+    return json.dumps({"cursor": ",".join(region_cursors), "data": history}, default=str)
+
+def format_price_statistics_payload(statistics):
+    """Serializes the rolling price statistics keyed by region."""
+    return json.dumps({document['region']: document for document in statistics}, default=str)
+
+def format_acquisition_payload(summary, daily, cumulative):
+    data = {
+        "summary": summary,
+        "daily": daily,
+        "cumulative": cumulative
+    }
+    return json.dumps(data, default=str)
@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+from functools import lru_cache
+import json
+import os
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from api_payloads import DAILY_AVERAGE_PERIODS, HISTORY_PERIODS, diff_current_payloads, format_current_payload, format_history_payload, format_history_delta_payload, parse_history_cursor, format_acquisition_payload, format_price_statistics_payload
+from async_mongodb_manager import AsyncMongoDBManager
+from data_update_notifier import LocalDataUpdateNotifier, create_notifier
+from event_broadcaster import CLOSED, EventBroadcaster, format_sse
+from item_catalog import catalog, DEFAULT_RECIPE
+from acquisition_cube import parse_cube_query, load_cube_payload
+from payload_cache import AsyncPayloadCache
+
+# Optional async deployment of the read API, run with: uvicorn asgi_app:app --port 8000
+load_dotenv()
+db_manager = AsyncMongoDBManager()
+payload_cache = AsyncPayloadCache(ttl=int(os.getenv('PAYLOAD_CACHE_TTL', '300')), max_entries=int(os.getenv('PAYLOAD_CACHE_MAX_ENTRIES', '128')))
+notifier = create_notifier(os.getenv('CACHE_BACKEND', 'simple'))
+price_broadcasters = {recipe: EventBroadcaster() for recipe in catalog.recipe_keys}
+latest_snapshots = {}
+# Serializes the reads that advance latest_snapshots, so an older read never replaces a newer snapshot
+snapshot_lock = asyncio.Lock()
+STREAM_KEEPALIVE_SECONDS = 15
+
+async def build_current_payload(recipe):
+    latest = await db_manager.get_latest_item_prices()
+    return format_current_payload(latest, recipe)
+
+async def get_history(period, recipe, since=None):
+    if period in DAILY_AVERAGE_PERIODS:
+        return await db_manager.get_all_daily_averages(period, recipe, since)
+    return await db_manager.get_all_total_costs(period, recipe, since)
+
+async def build_history_payload(period, recipe):
+    return format_history_payload(await get_history(period, recipe))
+
+async def build_acquisition_payload():
+    summary, daily, cumulative = await asyncio.gather(
+        db_manager.get_all_acquisitions("summary"),
+        db_manager.get_all_acquisitions("daily"),
+        db_manager.get_all_acquisitions("cumulative")
+    )
+    return format_acquisition_payload(summary, daily, cumulative)
+
+async def build_acquisition_cube_payload():
+    cube = await db_manager.get_all_acquisitions("cube")
+    return json.dumps(cube[0] if cube else None)
+
+get_acquisition_cube = lru_cache(maxsize=1)(load_cube_payload)
+
+async def build_price_statistics_payload():
+    return format_price_statistics_payload(await db_manager.get_price_statistics())
+
+def get_topic_payloads(topic):
+    """Returns the cache keys and payload builders that depend on the given data topic."""
+    if topic == 'acquisitions':
+        return {'acquisition_data': build_acquisition_payload, 'acquisition_cube': build_acquisition_cube_payload}
+    payloads = {'price_statistics': build_price_statistics_payload}
+    for recipe in catalog.recipe_keys:
+        payloads[f'current_data_{recipe}'] = lambda recipe=recipe: build_current_payload(recipe)
+        for period in HISTORY_PERIODS:
+            payloads[f'history_data_{period}_{recipe}'] = lambda period=period, recipe=recipe: build_history_payload(period, recipe)
+    return payloads
+
+def refresh_payloads(topic):
+    print(f"Data updated for {topic}, refreshing cached payloads.")
+    for cache_key, builder in get_topic_payloads(topic).items():
+        payload_cache.refresh(cache_key, builder)
+
+async def broadcast_price_update():
+    """Reads the new prices once and pushes the same encoded diff to every connected client."""
+    async with snapshot_lock:
+        latest = await db_manager.get_latest_item_prices()
+        for recipe, broadcaster in price_broadcasters.items():
+            snapshot = json.loads(format_current_payload(latest, recipe))
+            if snapshot is None:
+                continue
+            # The snapshot advances and its diff is published without an await in between,
+            # so a client connecting at any point gets the snapshot the next diff is based on
+            diff = diff_current_payloads(latest_snapshots.get(recipe), snapshot)
+            latest_snapshots[recipe] = snapshot
+            if len(broadcaster):
+                # Clients that missed a diff get the new snapshot instead, applying later diffs to an old state would corrupt it
+                broadcaster.publish(format_sse('diff', json.dumps(diff, default=str)),
+                                    resync=lambda snapshot=snapshot: format_sse('snapshot', json.dumps(snapshot, default=str)))
+
+async def load_latest_snapshot(recipe):
+    """Reads the recipe's first stream snapshot from the DB, the stale-while-revalidate payload cache could lag behind the diffs."""
+    async with snapshot_lock:
+        if recipe not in latest_snapshots:
+            snapshot = json.loads(format_current_payload(await db_manager.get_latest_item_prices(), recipe))
+            if snapshot is not None:
+                latest_snapshots[recipe] = snapshot
+
+def handle_data_update(topic):
+    refresh_payloads(topic)
+    if topic == 'prices':
+        asyncio.ensure_future(broadcast_price_update())
+
+def get_requested_recipe(request):
+    recipe = request.query_params.get('recipe', DEFAULT_RECIPE)
+    if recipe not in catalog.recipes:
+        raise HTTPException(status_code=404)
+    return recipe
+
+def json_response(data):
+    return Response(data, media_type='application/json')
+
+async def get_current_data(request):
+    recipe = get_requested_recipe(request)
+    return json_response(await payload_cache.get(f'current_data_{recipe}', lambda: build_current_payload(recipe)))
+
+async def get_history_data(request):
+    period = request.path_params['period']
+    if period not in HISTORY_PERIODS:
+        raise HTTPException(status_code=404)
+    recipe = get_requested_recipe(request)
+    since = request.query_params.get('since')
+    if since is not None:
+        try:
+            since = parse_history_cursor(since)
+        except ValueError:
+            raise HTTPException(status_code=400)
+        return json_response(format_history_delta_payload(await get_history(period, recipe, since), since))
+    return json_response(await payload_cache.get(f'history_data_{period}_{recipe}', lambda: build_history_payload(period, recipe)))
+
+async def stream_current_data(request):
+    """Server-sent events of the current prices, a full snapshot on connect followed by diffs after every update."""
+    recipe = get_requested_recipe(request)
+    broadcaster = price_broadcasters[recipe]
+
+    async def events():
+        if recipe not in latest_snapshots:
+            await load_latest_snapshot(recipe)
+        # Subscribing and reading the snapshot happen without an await in between, so no diff is missed or applied twice
+        queue = broadcaster.subscribe()
+        snapshot = latest_snapshots.get(recipe)
+        try:
+            yield format_sse('snapshot', json.dumps(snapshot, default=str))
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is CLOSED:
+                    return
+                yield message
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return StreamingResponse(events(), media_type='text/event-stream', headers=headers)
+
+async def get_price_statistics(request):
+    return json_response(await payload_cache.get('price_statistics', build_price_statistics_payload))
+
+async def get_acquisition_cube_data(request):
+    try:
+        filters, group_by = parse_cube_query(request.query_params)
+    except ValueError:
+        raise HTTPException(status_code=400)
+    cube = get_acquisition_cube(await payload_cache.get('acquisition_cube', build_acquisition_cube_payload))
+    return json_response(json.dumps(cube.query(filters, group_by)))
+
+async def get_acquisition_data(request):
+    return json_response(await payload_cache.get('acquisition_data', build_acquisition_payload))
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if isinstance(notifier, LocalDataUpdateNotifier):
+        # This app never runs the worker, so in-process notifications would never arrive and the stream would stay silent
+        raise RuntimeError("The ASGI app needs CACHE_BACKEND=redis or filesystem to receive data updates from the worker")
+    loop = asyncio.get_running_loop()
+    # Notifications arrive on a listener thread, the refresh itself runs on the event loop
+    notifier.listen(lambda topic: loop.call_soon_threadsafe(handle_data_update, topic))
+    yield
+    db_manager.close()
+
+app = Starlette(
+    routes=[
+        Route('/api/data/current', get_current_data, methods=['GET']),
+        Route('/api/data/current/stream', stream_current_data, methods=['GET']),
+        Route('/api/data/history/{period}', get_history_data, methods=['GET']),
+        Route('/api/data/statistics', get_price_statistics, methods=['GET']),
+        Route('/api/data/acquisitions', get_acquisition_data, methods=['GET']),
+        Route('/api/data/acquisitions/cube', get_acquisition_cube_data, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('ASGI_PORT', '8000')))
@@ -0,0 +1,61 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from item_catalog import DEFAULT_RECIPE
+from total_costs_compactor import get_bucket_query, stitch_total_costs
+from mongodb_manager import REGIONS, CURRENT_SNAPSHOT_ID, recipe_collection_name, get_period_query, get_region_since, get_client_options
+
+class AsyncMongoDBManager:
+    """Non-blocking counterpart of MongoDBManager's read methods, used by the ASGI app."""
+    def __init__(self):
+        load_dotenv()
+        connection_string = os.getenv('MONGODB_CONNECTION_STRING', '')
+        mongo_db_name = os.getenv('MONGODB_DB_NAME', '')
+        # Motor clients are bound to the event loop, so this one is not shared with MongoDBManager
+        self.client = AsyncIOMotorClient(connection_string, **get_client_options('api'))
+        self.db = self.client[mongo_db_name]
+
+    async def get_latest_item_prices(self):
+        """Retrieves the current document from 'latest_item_prices'."""
+        document = await self.db['latest_item_prices'].find_one({'_id': CURRENT_SNAPSHOT_ID})
+        if document is None:
+            document = await self.db['latest_item_prices'].find_one()
+        return document
+
+    async def get_data_within_period(self, collection_name, period="all", recipe=DEFAULT_RECIPE, since=None):
+        """Retrieves documents of every region within the given time period, querying the regions concurrently."""
+        async def get_region_data(region):
+            query = get_period_query(period, get_region_since(since, region))
+            collection = self.db[recipe_collection_name(collection_name, region, recipe)]
+            cursor = collection.find(query, {"_id": 0})
+            if since is not None:
+                cursor = cursor.sort("timestamp", 1)
+            data = await cursor.to_list(None)
+            if collection_name == "total_costs":
+                bucket_collection = self.db[recipe_collection_name("total_costs_daily", region, recipe)]
+                buckets = await bucket_collection.find(get_bucket_query(query), {"_id": 0}).to_list(None)
+                if buckets:
+                    data = stitch_total_costs(buckets, data, query)
+            return {"region": region, "data": data}
+
+        return list(await asyncio.gather(*(get_region_data(region) for region in REGIONS)))
+
+    async def get_all_total_costs(self, period="all", recipe=DEFAULT_RECIPE, since=None):
+        return await self.get_data_within_period("total_costs", period, recipe, since)
+
+    async def get_all_daily_averages(self, period="all", recipe=DEFAULT_RECIPE, since=None):
+        return await self.get_data_within_period("daily_averages", period, recipe, since)
+
+    async def get_price_statistics(self):
+        """Retrieves the rolling price statistics of every region without the resumable state."""
+        return await self.db['price_statistics'].find({}, {'_id': 0, 'state': 0}).to_list(None)
+
+    async def get_all_acquisitions(self, collection_suffix):
+        """Retrieves all documents from the specified collection."""
+        collection = self.db[f"acquisitions_{collection_suffix}"]
+        return await collection.find({}, {'_id': 0}).to_list(None)
+
+    def close(self):
+        self.client.close()
@@ -1,21 +1,40 @@
 from collections import defaultdict
+import numpy as np
+from item_catalog import catalog
 
 class AuctionDataAggregator:
     def __init__(self):
-        # Adjusting the default value to store both price and name
+        # Catalog items are summed in dense arrays, anything unknown falls back to a list of prices and names
+        self.price_sums = np.zeros(len(catalog.tracked_items), dtype=np.int64)
+        self.price_counts = np.zeros(len(catalog.tracked_items), dtype=np.int64)
         self.item_prices = defaultdict(list)
     
     def process_documents(self, documents):
         """Process all documents to aggregate item prices and their names."""
+        indices = []
+        prices = []
         for doc in documents:
             for item in doc['items']:
                 item_id = int(item['id'])
-                # Including the item name alongside its price
-                self.item_prices[item_id].append((int(item['price']), item['name']))
+                index = catalog.tracked_index_by_id.get(item_id)
+                if index is None:
+                    self.item_prices[item_id].append((int(item['price']), item['name']))
+                    continue
+                indices.append(index)
+                prices.append(int(item['price']))
+        np.add.at(self.price_sums, indices, prices)
+        np.add.at(self.price_counts, indices, 1)
     
     def calculate_averages(self):
         """Calculate average prices for all items."""
         averages = []
+        seen = self.price_counts > 0
+        average_prices = np.zeros_like(self.price_sums)
+        average_prices[seen] = self.price_sums[seen] // self.price_counts[seen]
+        for index in np.flatnonzero(seen).tolist():
+            item = catalog.tracked_items[index]
+            averages.append({"id": item["id"], "price": int(average_prices[index]), "name": item["name"]})
+
         for item_id, price_name_pairs in self.item_prices.items():
             total_price = sum(price for price, _ in price_name_pairs)
             average_price = total_price // len(price_name_pairs)
@@ -37,4 +56,4 @@ class AuctionDataAggregator:
         """Public method to process input documents and return the final output document."""
         self.process_documents(documents)
         averages = self.calculate_averages()
-        return self.generate_output_document(averages, timestamp)
\ No newline at end of file
+        return self.generate_output_document(averages, timestamp)
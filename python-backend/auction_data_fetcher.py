@@ -1,8 +1,11 @@
-import requests
+import instrumentation
+import upstream_http
 import base64
 import os
 import datetime
+import numpy as np
 from dotenv import load_dotenv
+from item_catalog import catalog, DEFAULT_RECIPE
 
 class AuctionDataFetcher:
     def __init__(self):
@@ -10,15 +13,23 @@ class AuctionDataFetcher:
 
     def get_access_token(self, client_id, client_secret):
         """Fetches an access token using client credentials."""
+        token = self.request_access_token(client_id, client_secret)
+        return token['access_token'] if token else None
+
+    def request_access_token(self, client_id, client_secret):
+        """Requests a new access token using client credentials, returns the token response with its 'expires_in' seconds."""
         credentials = f'{client_id}:{client_secret}'
         base64_encoded_credentials = base64.b64encode(credentials.encode()).decode()
         token_url = 'https://us.battle.net/oauth/token'
         data = {'grant_type': 'client_credentials'}
         headers = {'Authorization': f'Basic {base64_encoded_credentials}'}
         try:
-            response = requests.post(token_url, data=data, headers=headers)
+            response = upstream_http.post(token_url, data=data, headers=headers)
             response.raise_for_status()
-            return response.json()['access_token']
+            token = response.json()
+            if 'access_token' not in token:
+                raise ValueError("the token response has no access_token")
+            return token
         except Exception as e:
             print(f"Error acquiring access token: {e}")
             return None
@@ -32,9 +43,10 @@ class AuctionDataFetcher:
             'access_token': access_token
         }
         try:
-            response = requests.get(url, params=params)
+            response = upstream_http.get(url, params=params)
             response.raise_for_status()
-            return response.json()
+            with instrumentation.span('parse'):
+                return response.json()
         except Exception as e:
             print(f"Error fetching data for {region} region: {e}")
             return None
@@ -48,61 +60,64 @@ class AuctionDataFetcher:
             'access_token': access_token
         }
         try:
-            response = requests.get(url, params=params)
+            response = upstream_http.get(url, params=params)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             print(f"Error fetching data for {region} region: {e}")
             return None
 
-    def find_lowest_price(self, auction_data, item_id):
-        lowest_price = None
+    def find_lowest_prices(self, auction_data):
+        """Finds the lowest unit price of every catalog item in a single pass over the auctions."""
+        lowest_prices = [None] * len(catalog)
+        index_by_id = catalog.index_by_id
         for auction in auction_data['auctions']:
-            if auction['item']['id'] == item_id:
-                if lowest_price is None or auction['unit_price'] < lowest_price:
-                    lowest_price = auction['unit_price']
-        return lowest_price
-    
-    def calculate_total_cost(self, auction_data, items):
-        total_cost = 0
-        item_details = []
-
-        # Iterate through each item to calculate total cost and prepare details
-        for item in items:
-            # Skip Fyralath in the loop
-            if item['id'] == 206448:
+            index = index_by_id.get(auction['item']['id'])
+            if index is None:
                 continue
-
-            # Find the lowest auction price for the item
-            lowest_price = self.find_lowest_price(auction_data, item['id'])
-            if lowest_price is None:
-                print(f"Could not find auction data for item {item['name']}.")
-                continue
-
-            # Calculate cost based on amount needed, if applicable
-            if 'amount_needed' in item:
-                item_cost = lowest_price * item['amount_needed']
-                total_cost += item_cost
-
-                item_detail = {
+            unit_price = auction['unit_price']
+            if lowest_prices[index] is None or unit_price < lowest_prices[index]:
+                lowest_prices[index] = unit_price
+        found = np.array([price is not None for price in lowest_prices], dtype=bool)
+        prices = np.array([0 if price is None else price for price in lowest_prices], dtype=np.int64)
+        return prices, found
+    
+    def calculate_recipe_costs(self, prices, found, raw_prices=None):
+        """
+        Calculates the total cost of every configured recipe from one shared price table.
+        Returns a dict of recipe key to (total cost, item details), the recipe's own item first.
+        Items whose price differs from raw_prices, e.g. winsorized outliers, keep the observed price as raw_price.
+        """
+        for index in np.flatnonzero(~found).tolist():
+            print(f"Could not find auction data for item {catalog.items[index]['name']}.")
+
+        # Items without auctions do not contribute to the total cost
+        total_costs = catalog.total_costs(prices).tolist()
+        recipe_costs = {}
+        for row, recipe_key in enumerate(catalog.recipe_keys):
+            recipe = catalog.recipes[recipe_key]
+            requirements = catalog.requirements[row]
+            item_details = [{
+                "name": recipe["name"],
+                "id": recipe["id"],
+                "price": total_costs[row]
+            }]
+            for index in np.flatnonzero((requirements > 0) & found).tolist():
+                item = catalog.items[index]
+                item_details.append({
                     'name': item['name'],
                     'id': item['id'],
-                    'price': lowest_price,
-                    'amount_needed': item['amount_needed']
-                }
-
-            item_details.append(item_detail)
-
-        fyralath_detail = {
-            "name": "Fyr'alath the Dreamrender", 
-            "id": 206448,
-            "price": total_cost
-        }
-
-        # Append Fyralath as the first item
-        item_details.insert(0, fyralath_detail)
-
-        return total_cost, item_details
+                    'price': int(prices[index]),
+                    'amount_needed': int(requirements[index])
+                })
+                if raw_prices is not None and raw_prices[index] != prices[index]:
+                    item_details[-1]['raw_price'] = int(raw_prices[index])
+            recipe_costs[recipe_key] = (total_costs[row], item_details)
+        return recipe_costs
+
+    def calculate_total_cost(self, auction_data, recipe_key=DEFAULT_RECIPE):
+        prices, found = self.find_lowest_prices(auction_data)
+        return self.calculate_recipe_costs(prices, found)[recipe_key]
 
     def run(self):
         client_id = os.getenv("CLIENT_ID")
@@ -113,22 +128,7 @@ class AuctionDataFetcher:
             print("Failed to acquire access token. Exiting.")
             return None
 
-        items = [
-            {"name": "Fyr'alath the Dreamrender", "id": 206448},
-            {"name": "Shadowflame Essence", "id": 204464, "amount_needed": 10},
-            {"name": "Cosmic Ink", "id": 194755, "amount_needed": 250},
-            {"name": "Runed Writhebark", "id": 194863, "amount_needed": 50},
-            {"name": "Resonant Crystal", "id": 200113, "amount_needed": 200},
-            {"name": "Awakened Fire", "id": 190321, "amount_needed": 150},
-            {"name": "Awakened Earth", "id": 190316, "amount_needed": 100},
-            {"name": "Awakened Order", "id": 190324, "amount_needed": 50},
-            {"name": "Obsidian Cobraskin", "id": 205413, "amount_needed": 3},
-            {"name": "Mireslush Hide", "id": 193230, "amount_needed": 50},
-            {"name": "Zaralek Glowspores", "id": 204460, "amount_needed": 400},
-            {"name": "Dreaming Essence", "id": 208212, "amount_needed": 5}
-        ]
-
-        aggregated_data = []
+        aggregated_data = {recipe_key: [] for recipe_key in catalog.recipe_keys}
         regions = ['eu', 'us', 'tw', 'kr']
         for region in regions:
             print(f'Processing data for {region} region.')
@@ -138,24 +138,30 @@ class AuctionDataFetcher:
                 print(f"Failed to obtain auction data for {region} region. Skipping.")
                 continue
 
-            total_cost, region_data = self.calculate_total_cost(auction_data, items)
+            # One pass over the auctions serves every recipe
+            with instrumentation.span('pricing'):
+                prices, found = self.find_lowest_prices(auction_data)
+                del auction_data
+                recipe_costs = self.calculate_recipe_costs(prices, found)
 
             wow_token = self.fetch_wow_token(region, access_token)
             if wow_token is None:
                 print(f"Failed to obtain wow token data for {region} region. Skipping.")
 
-            wow_token_ratio = round(total_cost / wow_token['price'], 3)
-            aggregated_data.append({"region": region, "wow_token_ratio": wow_token_ratio, "items": region_data})
+            for recipe_key, (total_cost, region_data) in recipe_costs.items():
+                wow_token_ratio = round(total_cost / wow_token['price'], 3) if wow_token else None
+                aggregated_data[recipe_key].append({"region": region, "wow_token_ratio": wow_token_ratio, "items": region_data})
 
         # Save the latest data for all regions if there's any data to save
-        if aggregated_data:
+        if aggregated_data[DEFAULT_RECIPE]:
             print("Data processing and saving completed for all regions.")
             timestamp = datetime.datetime.now()
             timestamp_dt = timestamp.replace(minute=0, second=0, microsecond=0)
             timestamp_adjusted = int(timestamp_dt.timestamp() * 1000)
+            # The payload's 'data' key is derived from the default recipe when it is served
             data_with_timestamp = {
                 'timestamp': timestamp_adjusted,
-                'data': aggregated_data
+                'recipes': aggregated_data
             }
             return data_with_timestamp
         else:
@@ -0,0 +1,192 @@
+import datetime
+import os
+import time
+import numpy as np
+import instrumentation
+import upstream_http
+from auction_data_fetcher import AuctionDataFetcher
+from item_catalog import catalog, DEFAULT_RECIPE
+from price_statistics import RollingPriceStatistics
+
+# Outcomes of a conditional dump fetch, a failed fetch says nothing about whether the prices are still current
+FETCH_MODIFIED = 'modified'
+FETCH_NOT_MODIFIED = 'not_modified'
+FETCH_FAILED = 'failed'
+# The cached access token was rejected, it is renewed and the fetch retried once
+FETCH_UNAUTHORIZED = 'unauthorized'
+# Access tokens are renewed this many seconds before they expire, so a sample never runs with a lapsing token
+TOKEN_RENEWAL_MARGIN = 300
+
+class AuctionDataSampler(AuctionDataFetcher):
+    """
+    Polls the commodities endpoints more often than hourly.
+    Unchanged dumps are answered with a 304 and the pricing pass only runs for regions whose dump changed.
+    The sampler keeps the latest price table per region so only changed item prices have to be stored.
+    Outlier prices are winsorized against the rolling statistics before any recipe cost is calculated.
+    Regions whose dump could not be fetched for longer than REGION_STALE_MINUTES are left out of the results.
+    The access token is cached until shortly before it expires, so frequent samples do not request a token each.
+    """
+    def __init__(self):
+        super().__init__()
+        self.regions = ['eu', 'us', 'tw', 'kr']
+        self.last_modified = {}
+        self.access_token = None
+        self.access_token_expires_at = 0
+        # When each region's price table was last confirmed by a fetched or unchanged dump
+        self.confirmed_at = {}
+        self.stale_seconds = int(os.getenv('REGION_STALE_MINUTES', '30')) * 60
+        self.price_tables = {}
+        self.wow_token_prices = {}
+        self.last_hour_timestamp = None
+        self.statistics = RollingPriceStatistics(
+            window_hours=int(os.getenv('PRICE_STATISTICS_WINDOW_HOURS', '48')),
+            threshold=float(os.getenv('PRICE_OUTLIER_THRESHOLD', '5'))
+        )
+
+    def fetch_data_if_modified(self, region, access_token):
+        """
+        Fetches auction house data from a specific region if it changed since the last fetch.
+        Returns a tuple of the data and FETCH_MODIFIED, FETCH_NOT_MODIFIED, FETCH_UNAUTHORIZED or FETCH_FAILED.
+        """
+        url = f'https://{region}.api.blizzard.com/data/wow/auctions/commodities'
+        params = {
+            'namespace': f'dynamic-{region}',
+            'locale': 'en_US',
+            'access_token': access_token
+        }
+        headers = {}
+        if region in self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified[region]
+        try:
+            response = upstream_http.get(url, params=params, headers=headers)
+            if response.status_code == 304:
+                return None, FETCH_NOT_MODIFIED
+            if response.status_code == 401:
+                return None, FETCH_UNAUTHORIZED
+            response.raise_for_status()
+            if 'Last-Modified' in response.headers:
+                self.last_modified[region] = response.headers['Last-Modified']
+            with instrumentation.span('parse'):
+                return response.json(), FETCH_MODIFIED
+        except Exception as e:
+            print(f"Error fetching data for {region} region: {e}")
+            return None, FETCH_FAILED
+
+    def get_access_token(self, client_id, client_secret, renew=False):
+        """Returns the cached access token, requesting a new one if renew is set or the cached one is about to expire."""
+        if renew or self.access_token is None or time.time() >= self.access_token_expires_at - TOKEN_RENEWAL_MARGIN:
+            token = self.request_access_token(client_id, client_secret)
+            if token is None:
+                self.access_token = None
+                return None
+            self.access_token = token['access_token']
+            self.access_token_expires_at = time.time() + token.get('expires_in', 0)
+        return self.access_token
+
+    def find_price_changes(self, region, prices, found):
+        """Returns the items whose lowest price changed since the previous sample, a missing item has price None."""
+        if region in self.price_tables:
+            previous_prices, previous_found = self.price_tables[region]
+            changed = (found != previous_found) | (found & (prices != previous_prices))
+        else:
+            changed = found.copy()
+        return [
+            {"id": catalog.items[index]["id"], "price": int(prices[index]) if found[index] else None}
+            for index in np.flatnonzero(changed).tolist()
+        ]
+
+    def get_current_regions(self):
+        """Returns the regions whose price table was confirmed recently enough to be reported as current prices."""
+        now = time.time()
+        regions = []
+        for region in self.regions:
+            if region not in self.price_tables:
+                continue
+            if now - self.confirmed_at.get(region, 0) > self.stale_seconds:
+                print(f"Auction data for {region} region is stale. Leaving it out of the results.")
+                continue
+            regions.append(region)
+        return regions
+
+    def build_result(self, hour_timestamp, sampled_at, changes):
+        """Builds the latest prices document of every recipe from the stored price tables of the current regions."""
+        aggregated_data = {recipe_key: [] for recipe_key in catalog.recipe_keys}
+        for region in self.get_current_regions():
+            prices, found = self.price_tables[region]
+            filtered_prices, outliers = self.statistics.filter_prices(region, hour_timestamp, prices, found)
+            for index in np.flatnonzero(outliers).tolist():
+                print(f"Winsorized outlier price of {catalog.items[index]['name']} in {region}: {prices[index]} -> {filtered_prices[index]}")
+            wow_token_price = self.wow_token_prices.get(region)
+            for recipe_key, (total_cost, region_data) in self.calculate_recipe_costs(filtered_prices, found, prices).items():
+                wow_token_ratio = round(total_cost / wow_token_price, 3) if wow_token_price else None
+                aggregated_data[recipe_key].append({"region": region, "wow_token_ratio": wow_token_ratio, "items": region_data})
+
+        return {
+            'timestamp': hour_timestamp,
+            'sampled_at': sampled_at,
+            'recipes': aggregated_data,
+            'changes': changes
+        }
+
+    def run(self):
+        client_id = os.getenv("CLIENT_ID")
+        client_secret = os.getenv("CLIENT_SECRET")
+        access_token = self.get_access_token(client_id, client_secret)
+
+        if access_token is None:
+            print("Failed to acquire access token. Exiting.")
+            return None
+
+        changes = {}
+        for region in self.regions:
+            auction_data, status = self.fetch_data_if_modified(region, access_token)
+            if status == FETCH_UNAUTHORIZED:
+                print("Access token rejected. Requesting a new one.")
+                access_token = self.get_access_token(client_id, client_secret, renew=True)
+                if access_token is None:
+                    print("Failed to renew the access token. Skipping the remaining regions.")
+                    break
+                auction_data, status = self.fetch_data_if_modified(region, access_token)
+            if status in (FETCH_FAILED, FETCH_UNAUTHORIZED):
+                print(f"Failed to fetch auction data for {region} region. Keeping its previous prices until they are stale.")
+                continue
+            self.confirmed_at[region] = time.time()
+            if status == FETCH_NOT_MODIFIED:
+                print(f"Auction data for {region} region not modified. Skipping.")
+                continue
+
+            print(f'Processing data for {region} region.')
+            with instrumentation.span('pricing'):
+                prices, found = self.find_lowest_prices(auction_data)
+            del auction_data
+            region_changes = self.find_price_changes(region, prices, found)
+            self.price_tables[region] = (prices, found)
+            if region_changes:
+                changes[region] = region_changes
+
+            wow_token = self.fetch_wow_token(region, access_token)
+            if wow_token is None:
+                print(f"Failed to obtain wow token data for {region} region.")
+            else:
+                self.wow_token_prices[region] = wow_token['price']
+
+        timestamp = datetime.datetime.now()
+        sampled_at = int(timestamp.timestamp() * 1000)
+        hour_timestamp = int(timestamp.replace(minute=0, second=0, microsecond=0).timestamp() * 1000)
+
+        # Still produce a result once per hour so the hourly total costs never get a gap
+        if not changes and hour_timestamp == self.last_hour_timestamp:
+            print("No price changes since the previous sample.")
+            return None
+        with instrumentation.span('pricing'):
+            result = self.build_result(hour_timestamp, sampled_at, changes)
+        if not result['recipes'][DEFAULT_RECIPE]:
+            print("No current auction data. Exiting.")
+            return None
+
+        self.last_hour_timestamp = hour_timestamp
+        return result
+
+if __name__ == "__main__":
+    sampler = AuctionDataSampler()
+    sampler.run()
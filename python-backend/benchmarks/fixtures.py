@@ -0,0 +1,104 @@
+import random
+from datetime import datetime, timedelta
+from item_catalog import catalog
+from mongodb_manager import REGIONS, recipe_collection_name
+
+MS_HOUR = 60 * 60 * 1000
+MS_DAY = 24 * MS_HOUR
+CLASSES = ['death-knight', 'paladin', 'warrior']
+
+# A 1x history is a month of hourly total costs and four months of daily averages per region
+BASE_HOURLY_POINTS = 30 * 24
+BASE_DAILY_POINTS = 120
+
+def generate_commodities_dump(auction_count=200000, seed=0):
+    """Returns a commodities response like Blizzard's, mostly unrelated items with some listings of every catalog item."""
+    rng = random.Random(seed)
+    catalog_ids = [item['id'] for item in catalog.items]
+    auctions = []
+    for auction_id in range(auction_count):
+        if rng.random() < 0.05:
+            item_id = rng.choice(catalog_ids)
+        else:
+            item_id = rng.randint(1, 220000)
+        auctions.append({
+            'id': auction_id,
+            'item': {'id': item_id},
+            'quantity': rng.randint(1, 200),
+            'unit_price': rng.randint(100, 5000000),
+            'time_left': 'SHORT'
+        })
+    return {'auctions': auctions}
+
+def generate_price_items(rng, base_prices):
+    items = []
+    total_cost = 0
+    for item, base_price in zip(catalog.items, base_prices):
+        price = int(base_price * rng.uniform(0.9, 1.1))
+        total_cost += price * int(catalog.requirements_vector()[catalog.index_by_id[item['id']]])
+        items.append({'name': item['name'], 'id': item['id'], 'price': price})
+    recipe = catalog.recipes[catalog.recipe_keys[0]]
+    items.insert(0, {'name': recipe['name'], 'id': recipe['id'], 'price': total_cost})
+    return items
+
+def generate_history(scale=1, seed=0, end_time=None):
+    """
+    Returns synthetic total_costs and daily_averages documents per collection name, ending at end_time.
+    The number of points grows linearly with scale.
+    """
+    rng = random.Random(seed)
+    end_time = end_time or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    end_timestamp = int(end_time.timestamp() * 1000)
+    base_prices = [rng.randint(10000, 1000000) for _ in catalog.items]
+    collections = {}
+    for region in REGIONS:
+        hourly_points = BASE_HOURLY_POINTS * scale
+        collections[recipe_collection_name('total_costs', region)] = [
+            {'timestamp': end_timestamp - hour * MS_HOUR, 'items': generate_price_items(rng, base_prices)}
+            for hour in range(hourly_points)
+        ]
+        daily_points = BASE_DAILY_POINTS * scale
+        day_timestamp = end_timestamp - end_timestamp % MS_DAY
+        collections[recipe_collection_name('daily_averages', region)] = [
+            {'timestamp': day_timestamp - day * MS_DAY, 'items': generate_price_items(rng, base_prices)}
+            for day in range(daily_points)
+        ]
+    return collections
+
+def generate_exchange_items(days=3 * 365, seed=0):
+    """Returns undermine.exchange style daily snapshots of every catalog item for one region."""
+    rng = random.Random(seed)
+    first_day = int(datetime(2023, 11, 25).timestamp() * 1000) // MS_DAY
+    return [
+        {
+            'name': item['name'],
+            'id': item['id'],
+            'snapshots': [
+                {'timestamp': (first_day + day) * MS_DAY, 'price': rng.randint(10000, 1000000)}
+                for day in range(days) if rng.random() > 0.01
+            ]
+        }
+        for item in catalog.items
+    ]
+
+def generate_characters(count=30000, seed=0):
+    """Returns synthetic character documents per class collection for AcquisitionDataAggregator."""
+    rng = random.Random(seed)
+    first_acquisition = datetime(2023, 11, 28)
+    days_since = (datetime.utcnow() - first_acquisition).days
+    collections = {f'chars_{class_name}': [] for class_name in CLASSES}
+    for char_id in range(count):
+        class_name = CLASSES[char_id % len(CLASSES)]
+        acquired = rng.random() < 0.4
+        acquired_date = first_acquisition + timedelta(days=rng.randint(0, max(days_since, 1)), seconds=rng.randint(0, 86399))
+        collections[f'chars_{class_name}'].append({
+            'name': f'char{char_id}',
+            'char_id': char_id,
+            'region': rng.choice(REGIONS),
+            'realm': f'realm-{rng.randint(1, 250)}',
+            'class': class_name,
+            'fyralath_acquired_date': int(acquired_date.timestamp()) if acquired else 0,
+            'fyrakk_kills_hc': rng.randint(0, 30),
+            'fyrakk_kills_m': rng.randint(0, 10)
+        })
+    return collections
@@ -0,0 +1,207 @@
+"""
+Benchmarks the ingestion stages and API endpoints against synthetic data.
+Run from the python-backend directory:
+
+    python -m benchmarks.run --scales 1,10 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --scales 1,10 --compare benchmarks/baseline.json
+
+By default the database is mongomock, set --mongo to a connection string to use a local mongod instead.
+A pipeline run recorded with UPSTREAM_MODE=record can be replayed offline with --replay <cassette dir>.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pymongo import monitoring
+import mongodb_manager
+from benchmarks import fixtures
+
+BENCHMARK_DB_NAME = 'fyralath_benchmark'
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Counts the commands sent to a real mongod."""
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+round_trips = RoundTripCounter()
+
+def use_mongomock():
+    """Points every MongoDBManager at one shared mongomock client and counts collection calls as round trips."""
+    import mongomock
+    client = mongomock.MongoClient()
+    mongodb_manager.MongoClient = lambda *args, **kwargs: client
+    for method_name in ['find', 'find_one', 'insert_one', 'insert_many', 'update_one', 'replace_one', 'delete_one',
+                        'delete_many', 'bulk_write', 'count_documents', 'aggregate', 'find_one_and_update']:
+        method = getattr(mongomock.collection.Collection, method_name)
+        def counted(self, *args, __method=method, **kwargs):
+            round_trips.count += 1
+            return __method(self, *args, **kwargs)
+        setattr(mongomock.collection.Collection, method_name, counted)
+
+def measure(name, func, results, repeat=1):
+    """Runs func repeat times and records the mean time, the peak traced memory and the DB round trips per run."""
+    round_trips.count = 0
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    duration = (time.perf_counter() - start_time) / repeat
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results[name] = {
+        'seconds': round(duration, 6),
+        'peak_memory_mb': round(peak_memory / 1024 / 1024, 3),
+        'round_trips': round_trips.count // repeat
+    }
+    print(f"{name:<45} {duration * 1000:>10.2f} ms {results[name]['peak_memory_mb']:>9.2f} MB {results[name]['round_trips']:>7} round trips")
+
+def seed_collections(db, collections):
+    for collection_name, documents in collections.items():
+        db[collection_name].delete_many({})
+        if documents:
+            db[collection_name].insert_many([dict(document) for document in documents])
+        db[collection_name].create_index('timestamp')
+
+def benchmark_ingestion(results, character_counts):
+    from auction_data_fetcher import AuctionDataFetcher
+    from auction_data_aggregator import AuctionDataAggregator
+    from exchange_data_parser import ExchangeDataParser
+    from acquisition_data_aggregator import AcquisitionDataAggregator
+
+    dump = fixtures.generate_commodities_dump()
+    fetcher = AuctionDataFetcher()
+    def price_dump():
+        prices, found = fetcher.find_lowest_prices(dump)
+        fetcher.calculate_recipe_costs(prices, found)
+    measure('ingest/auction_pricing', price_dump, results, repeat=3)
+
+    day_documents = fixtures.generate_history(scale=1)[mongodb_manager.recipe_collection_name('total_costs', 'eu')][:24]
+    measure('ingest/daily_aggregation', lambda: AuctionDataAggregator().aggregate_data_and_generate_output(day_documents, 0), results, repeat=20)
+
+    exchange_items = fixtures.generate_exchange_items()
+    parser = ExchangeDataParser()
+    measure('ingest/exchange_parser', lambda: parser.process_data_for_region(exchange_items, parser.timestamp_cutoff), results, repeat=3)
+
+    db = mongodb_manager.MongoDBManager().db
+    for count in character_counts:
+        seed_collections(db, fixtures.generate_characters(count))
+        measure(f'ingest/acquisition_aggregation_{count}', lambda: AcquisitionDataAggregator().aggregate_data(), results)
+
+def benchmark_endpoints(results, scales):
+    import main
+    from payload_snapshot import PayloadSnapshot
+    from item_catalog import DEFAULT_RECIPE
+
+    client = main.app.test_client()
+    db = main.db_manager.db
+    endpoints = ['/api/data/current', '/api/data/history/all', '/api/data/history/month',
+                 '/api/data/history/week', '/api/data/history/day', '/api/data/acquisitions']
+    latest = {'timestamp': 0, 'recipes': {DEFAULT_RECIPE: [{'region': region, 'wow_token_ratio': 0.5, 'items': []} for region in mongodb_manager.REGIONS]}}
+    seed_collections(db, {'latest_item_prices': [latest]})
+
+    for scale in scales:
+        seed_collections(db, fixtures.generate_history(scale))
+        for endpoint in endpoints:
+            def cold_request():
+                main.payload_cache.entries.clear()
+                main.cache.clear()
+                client.get(endpoint)
+            measure(f'api/{scale}x{endpoint}/cold', cold_request, results, repeat=3)
+            measure(f'api/{scale}x{endpoint}/warm', lambda: client.get(endpoint), results, repeat=50)
+
+    # Time to the first response of a restarted api, rebuilding every payload or loading them from the snapshot
+    snapshot_dir = tempfile.mkdtemp()
+    main.payload_snapshot = PayloadSnapshot(os.path.join(snapshot_dir, 'payload_snapshot.json.gz'))
+    for endpoint in endpoints:
+        client.get(endpoint)
+    main.save_payload_snapshot()
+    for load_snapshot in (False, True):
+        def restart():
+            main.payload_cache.entries.clear()
+            main.cache.clear()
+            if load_snapshot:
+                main.load_payload_snapshot()
+            for endpoint in endpoints:
+                client.get(endpoint)
+        measure(f"api/{scales[-1]}x/restart_{'snapshot' if load_snapshot else 'cold'}", restart, results, repeat=3)
+    shutil.rmtree(snapshot_dir)
+
+def benchmark_replay(results, cassette_dir, latency):
+    """
+    Runs the hourly auction and weekly acquisition pipelines against upstream responses recorded with UPSTREAM_MODE=record,
+    no network needed. The acquisition pipeline only requests the characters in the database, so its replay needs --mongo
+    with the characters of the recorded run.
+    """
+    import main
+    import upstream_http
+
+    upstream_http.configure('replay', cassette_dir, latency)
+    measure('pipeline/fetch_auction_data', main.fetch_auction_data, results)
+    measure('pipeline/fetch_acquisition_data', main.fetch_acquisition_data, results)
+
+def compare(results, baseline, threshold):
+    """Prints the stages that got slower than threshold times the baseline or need more round trips, returns their count."""
+    regressions = 0
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        slower = result['seconds'] > base['seconds'] * threshold
+        more_round_trips = result['round_trips'] > base['round_trips']
+        if slower or more_round_trips:
+            regressions += 1
+            print(f"REGRESSION {name}: {base['seconds'] * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms, "
+                  f"{base['round_trips']} -> {result['round_trips']} round trips")
+    print(f"{regressions} regressions against the baseline")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion pipeline and API endpoints.")
+    parser.add_argument('--mongo', help="MongoDB connection string of a local mongod, defaults to mongomock")
+    parser.add_argument('--scales', default='1,10,100', help="history scales to benchmark the endpoints with")
+    parser.add_argument('--characters', default='30000,300000', help="character pool sizes for the acquisition aggregation")
+    parser.add_argument('--only', choices=['ingestion', 'api', 'replay'], help="run only one group of benchmarks")
+    parser.add_argument('--replay', help="cassette directory of a recorded pipeline run to replay")
+    parser.add_argument('--replay-latency', type=float, default=0, help="factor of the recorded upstream latency to replay with, 1 is real time")
+    parser.add_argument('--save-baseline', help="write the results to this file")
+    parser.add_argument('--compare', help="compare the results against this baseline file")
+    parser.add_argument('--threshold', type=float, default=1.25, help="allowed slowdown factor before a stage counts as a regression")
+    args = parser.parse_args()
+
+    os.environ['MONGODB_DB_NAME'] = BENCHMARK_DB_NAME
+    if args.mongo:
+        os.environ['MONGODB_CONNECTION_STRING'] = args.mongo
+        monitoring.register(round_trips)
+    else:
+        use_mongomock()
+
+    results = {}
+    if args.only in (None, 'ingestion'):
+        benchmark_ingestion(results, [int(count) for count in args.characters.split(',')])
+    if args.only in (None, 'api'):
+        benchmark_endpoints(results, [int(scale) for scale in args.scales.split(',')])
+    if args.replay and args.only in (None, 'replay'):
+        benchmark_replay(results, args.replay, args.replay_latency)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
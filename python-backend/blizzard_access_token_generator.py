@@ -2,7 +2,7 @@ import sys
 import time
 import os
 import json
-import requests
+import upstream_http
 from dotenv import load_dotenv
 import base64
 
@@ -19,7 +19,7 @@ def get_access_token():
     data = {'grant_type': 'client_credentials'}
     headers = {'Authorization': f'Basic {base64_encoded_credentials}'}
     try:
-        response = requests.post(token_url, data=data, headers=headers)
+        response = upstream_http.post(token_url, data=data, headers=headers)
         response.raise_for_status()
         return response.json()['access_token']
     except Exception as e:
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+import traceback
+from file_utils import write_atomic
+from mongodb_manager import DATA_TOPICS
+
+DATA_UPDATED_CHANNEL = 'fyralath:data-updated'
+
+def notify(callback, topic):
+    """Calls a listener, a failing listener must not end the thread delivering the notifications."""
+    try:
+        callback(topic)
+    except Exception as e:
+        print(f"Error handling data update for {topic}: {e}")
+        traceback.print_exc()
+
+class LocalDataUpdateNotifier:
+    """Delivers notifications to listeners in the same process, used when the API and worker run together and in tests."""
+    def __init__(self):
+        self.callbacks = []
+
+    def publish(self, topic):
+        for callback in self.callbacks:
+            callback(topic)
+
+    def listen(self, callback):
+        self.callbacks.append(callback)
+
+class FileDataUpdateNotifier:
+    """
+    Keeps a version counter per topic in a JSON file shared by all processes on the host.
+    Listeners poll the file and are called for every topic whose version changed.
+    """
+    def __init__(self, directory, poll_interval=1):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'data_versions.json')
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+
+    def read_versions(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def publish(self, topic):
+        with self.lock:
+            versions = self.read_versions()
+            versions[topic] = versions.get(topic, 0) + 1
+            write_atomic(self.path, json.dumps(versions).encode('utf-8'))
+
+    def listen(self, callback):
+        # Read before the thread starts, so an update published right after listen() is not taken as the baseline
+        initial_versions = self.read_versions()
+
+        def poll():
+            versions = initial_versions
+            while True:
+                time.sleep(self.poll_interval)
+                try:
+                    latest_versions = self.read_versions()
+                except Exception as e:
+                    # The versions are compared again on the next poll, so no update is lost
+                    print(f"Error reading data versions from {self.path}: {e}")
+                    continue
+                for topic, version in latest_versions.items():
+                    if versions.get(topic) != version:
+                        notify(callback, topic)
+                versions = latest_versions
+
+        threading.Thread(target=poll, daemon=True).start()
+
+class RedisDataUpdateNotifier:
+    """
+    Publishes notifications over Redis pub/sub so API processes on any host receive them.
+    A lost connection is retried with exponential backoff, and as pub/sub does not keep the messages
+    published in the meantime, every topic is refreshed once reconnected.
+    """
+    def __init__(self, redis_url, reconnect_delay=1, max_reconnect_delay=60):
+        import redis
+        self.redis = redis.Redis.from_url(redis_url)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+    def publish(self, topic):
+        self.redis.publish(DATA_UPDATED_CHANNEL, topic)
+
+    def listen(self, callback):
+        def subscribe():
+            delay = self.reconnect_delay
+            reconnecting = False
+            while True:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(DATA_UPDATED_CHANNEL)
+                    delay = self.reconnect_delay
+                    if reconnecting:
+                        for topic in DATA_TOPICS:
+                            notify(callback, topic)
+                    for message in pubsub.listen():
+                        notify(callback, message['data'].decode('utf-8'))
+                except Exception as e:
+                    print(f"Lost the data update subscription: {e}. Reconnecting in {delay} s.")
+                finally:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+                reconnecting = True
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+        threading.Thread(target=subscribe, daemon=True).start()
+
+def create_notifier(cache_backend):
+    """Returns the notifier matching the shared cache backend."""
+    if cache_backend == 'redis':
+        return RedisDataUpdateNotifier(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+    if cache_backend == 'filesystem':
+        return FileDataUpdateNotifier(os.getenv('CACHE_DIR', './cache'))
+    return LocalDataUpdateNotifier()
@@ -0,0 +1,50 @@
+import asyncio
+
+# Queued for a subscriber that fell behind and has no resync message, the stream ends and the client reconnects
+CLOSED = None
+
+class EventBroadcaster:
+    """
+    Fans every published message out to all subscribers of one event loop.
+    Each subscriber is only a bounded queue, so idle connections cost no threads, and a slow
+    subscriber never holds up the others. Messages may depend on the ones before them, e.g. diffs,
+    so a subscriber whose queue overflows gets a resync message instead of silently missing one.
+    """
+    def __init__(self, queue_size=16):
+        self.queue_size = queue_size
+        self.subscribers = set()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, message, resync=None):
+        """
+        Queues the message for every subscriber. The queue of a subscriber that fell behind is replaced with
+        resync(), a message that stands on its own like a full snapshot, or with CLOSED if there is none.
+        """
+        resync_message = None
+        for queue in list(self.subscribers):
+            if not queue.full():
+                queue.put_nowait(message)
+                continue
+            while not queue.empty():
+                queue.get_nowait()
+            if resync is None:
+                self.subscribers.discard(queue)
+                queue.put_nowait(CLOSED)
+                continue
+            if resync_message is None:
+                resync_message = resync()
+            queue.put_nowait(resync_message)
+
+def format_sse(event, data):
+    """Encodes a server-sent event, data must already be a single line of JSON."""
+    return f"event: {event}\ndata: {data}\n\n".encode('utf-8')
@@ -1,55 +1,78 @@
 from datetime import datetime
+import numpy as np
 from auction_data_aggregator import AuctionDataAggregator
+from item_catalog import catalog, FYRALATH_ID, FYRALATH_NAME
 from mongodb_manager import MongoDBManager
 
 class ExchangeDataParser:
     def __init__(self):
         self.timestamp_cutoff = datetime(2023, 11, 25).timestamp()
         self.aggregator = AuctionDataAggregator()
-        self.item_requirements = {
-            204464: 10, 194755: 250, 194863: 50, 200113: 200,
-            190321: 150, 190316: 100, 190324: 50, 205413: 3,
-            193230: 50, 204460: 400, 208212: 5
-        }
+        self.item_requirements = catalog.requirements_vector()
 
     def aggregate_and_save(self, data):
-        mongo_db_manager = MongoDBManager()
+        mongo_db_manager = MongoDBManager(workload='ingest')
         for region, items_data in data.items():
             processed_data = self.process_data_for_region(items_data, self.timestamp_cutoff)
             if processed_data:
-                mongo_db_manager.bulk_save_to_collection(f'daily_averages_{region}', processed_data)
+                # Upsert on timestamp so re-running the import does not duplicate days
+                mongo_db_manager.bulk_upsert_by_timestamp(f'daily_averages_{region}', processed_data)
 
-    def process_data_for_region(self, items_data, timestamp_cutoff):
-        valid_snapshots = {}
+    def build_price_matrix(self, items_data, timestamp_cutoff):
+        """
+        Aligns every catalog item's snapshots on a shared, sorted day index.
+        Returns the day index, a (catalog items x days) price matrix and a mask of which cells were present.
+        """
+        series = {}
         for item in items_data:
-            item_id = item['id']
-            item_name = item['name']
-            for snapshot in item['snapshots']:
-                timestamp = snapshot['timestamp']
-                if timestamp >= timestamp_cutoff:
-                    if timestamp not in valid_snapshots:
-                        valid_snapshots[timestamp] = []
-                    valid_snapshots[timestamp].append({
-                        "name": item_name,
-                        "id": item_id,
-                        "price": snapshot['price'],
-                        "amount_needed": self.item_requirements.get(item_id, 0)
-                    })
-
-        # Filter out dates where not all items are present
-        complete_snapshots = {ts: items for ts, items in valid_snapshots.items() if len(items) == len(self.item_requirements)}
+            index = catalog.index_by_id.get(item['id'])
+            if index is None:
+                continue
+            snapshots = [s for s in item['snapshots'] if s['timestamp'] >= timestamp_cutoff]
+            timestamps = np.fromiter((s['timestamp'] for s in snapshots), dtype=np.int64, count=len(snapshots))
+            prices = np.fromiter((s['price'] for s in snapshots), dtype=np.int64, count=len(snapshots))
+            series[index] = (timestamps, prices)
+
+        if not series:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, np.empty((len(catalog), 0), dtype=np.int64), np.empty((len(catalog), 0), dtype=bool)
+
+        day_index = np.unique(np.concatenate([timestamps for timestamps, _ in series.values()]))
+        prices = np.zeros((len(catalog), len(day_index)), dtype=np.int64)
+        present = np.zeros((len(catalog), len(day_index)), dtype=bool)
+        for index, (timestamps, item_prices) in series.items():
+            columns = np.searchsorted(day_index, timestamps)
+            prices[index, columns] = item_prices
+            present[index, columns] = True
+
+        return day_index, prices, present
+
+    def process_data_for_region(self, items_data, timestamp_cutoff):
+        day_index, prices, present = self.build_price_matrix(items_data, timestamp_cutoff)
+        if day_index.size == 0:
+            return []
+
+        # Filter out dates where not all required items are present
+        required = self.item_requirements > 0
+        complete_days = present[required].all(axis=0)
+        day_index = day_index[complete_days]
+        prices = prices[required][:, complete_days]
+
+        total_costs = self.item_requirements[required] @ prices
 
+        # Convert to plain python ints, numpy scalars can not be encoded to BSON
+        required_items = [item for item, is_required in zip(catalog.items, required) if is_required]
+        item_prices = prices.T.tolist()
         documents = []
-        for timestamp, items in complete_snapshots.items():
-            total_cost = sum(item['price'] * item['amount_needed'] for item in items)
+        for timestamp, total_cost, day_prices in zip(day_index.tolist(), total_costs.tolist(), item_prices):
             document = {
                 "timestamp": timestamp,
-                "items": [{"name":item["name"], "id": item["id"], "price": item["price"]} for item in items]
+                "items": [{"name": item["name"], "id": item["id"], "price": price} for item, price in zip(required_items, day_prices)]
             }
             
             fyralath_detail = {
-                "name": "Fyr'alath the Dreamrender", 
-                "id": 206448,
+                "name": FYRALATH_NAME, 
+                "id": FYRALATH_ID,
                 "price": total_cost
             }
 
@@ -58,4 +81,4 @@ class ExchangeDataParser:
 
             documents.append(document)
 
-        return documents
\ No newline at end of file
+        return documents
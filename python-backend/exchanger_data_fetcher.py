@@ -1,7 +1,8 @@
-import requests
+import upstream_http
 import struct
 import json
 from exchange_data_parser import ExchangeDataParser
+from item_catalog import catalog
 
 MS_SEC = 1000
 MS_MINUTE = 60 * MS_SEC
@@ -22,7 +23,7 @@ def skip_data(buffer, offset, bytes):
 def get_item_state(realm_id, item_id):
     mask = item_id & 0xFF
     url = f"https://undermine.exchange/data/cached/{realm_id}/{mask}/{item_id}.bin"
-    response = requests.get(url)
+    response = upstream_http.get(url)
     buffer = response.content
 
     offset = 0
@@ -71,26 +72,10 @@ class ExchangeDataFetcher:
             "kr": 32515
         }
 
-        items_details = {
-        "items": [
-            {"name": "Shadowflame Essence", "id": 204464},
-            {"name": "Cosmic Ink", "id": 194755},
-            {"name": "Runed Writhebark", "id": 194863},
-            {"name": "Resonant Crystal", "id": 200113},
-            {"name": "Awakened Fire", "id": 190321},
-            {"name": "Awakened Earth", "id": 190316},
-            {"name": "Awakened Order", "id": 190324},
-            {"name": "Obsidian Cobraskin", "id": 205413},
-            {"name": "Mireslush Hide", "id": 193230},
-            {"name": "Zaralek Glowspores", "id": 204460},
-            {"name": "Dreaming Essence", "id": 208212},
-            ]
-        }
-
         data = {realm: [] for realm in realms}
 
         for realm_name, realm_id in realms.items():
-            for item in items_details["items"]:
+            for item in catalog.items:
                 item_state = get_item_state(realm_id, item["id"])
                 if "daily" in item_state:
                     data[realm_name].append({
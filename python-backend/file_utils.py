@@ -0,0 +1,8 @@
+import os
+
+def write_atomic(path, content):
+    """Writes to a temporary file and renames it over the target so readers never see a partial file."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(content)
+    os.replace(temp_path, path)
@@ -0,0 +1,99 @@
+from collections import defaultdict
+import gzip
+import hashlib
+import json
+import os
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+from file_utils import write_atomic
+
+# Credentials differ between runs and must not end up on disk
+SECRET_PARAMS = ('access_token', 'client_id', 'client_secret')
+# Request headers that change the upstream response, every other header is ignored when matching
+MATCHED_HEADERS = ('If-Modified-Since', 'If-None-Match')
+# The body is stored decoded, so the transfer headers of the original response no longer apply,
+# and session or credential headers must not end up on disk
+DROPPED_RESPONSE_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie', 'set-cookie2',
+                            'authorization', 'proxy-authenticate', 'www-authenticate')
+
+class HttpCassette:
+    """
+    Directory of recorded upstream HTTP responses.
+    Every response is a gzipped file of one JSON metadata line, with the status, headers and the recorded duration,
+    followed by the raw body. Identical requests are numbered in the order they were made and replayed in the same order.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+
+    def get_request_key(self, method, url, params=None, data=None, headers=None, **kwargs):
+        """Returns a stable hash of everything that identifies a request, without credentials."""
+        def without_secrets(values):
+            if not isinstance(values, dict):
+                return values
+            return {key: value for key, value in sorted(values.items()) if key not in SECRET_PARAMS}
+
+        headers = CaseInsensitiveDict(headers or {})
+        request = {
+            'method': method.upper(),
+            'url': url,
+            'params': without_secrets(params),
+            'data': without_secrets(data),
+            'headers': {name: headers[name] for name in MATCHED_HEADERS if name in headers}
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:24]
+
+    def next_path(self, key):
+        """Returns the file of the key's next response and advances the key's counter."""
+        with self.lock:
+            sequence = self.counters[key]
+            self.counters[key] += 1
+        return os.path.join(self.directory, f"{key}-{sequence}.gz")
+
+    def record(self, method, url, request_kwargs, response, duration):
+        """Saves a live response and how long it took."""
+        os.makedirs(self.directory, exist_ok=True)
+        metadata = {
+            'method': method.upper(),
+            # The requested url, the final one can carry the access token in its query string
+            'url': url,
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_RESPONSE_HEADERS},
+            'duration': duration
+        }
+        body = response.content
+        if response.ok and b'"access_token"' in body[:1024]:
+            # Replayed requests are matched without their token, so the issued token is not needed either
+            try:
+                token = json.loads(body)
+            except ValueError:
+                token = None
+            if isinstance(token, dict) and 'access_token' in token:
+                body = json.dumps({**token, 'access_token': 'recorded'}).encode('utf-8')
+        path = self.next_path(self.get_request_key(method, url, **request_kwargs))
+        write_atomic(path, gzip.compress(json.dumps(metadata).encode('utf-8') + b'\n' + body, compresslevel=6))
+
+    def replay(self, method, url, request_kwargs):
+        """
+        Returns the next recorded response of the request and its recorded duration.
+        A request made more often than it was recorded fails like a network error, as does one never recorded,
+        so a replay never serves a response the recorded run did not see.
+        """
+        path = self.next_path(self.get_request_key(method, url, **request_kwargs))
+        if not os.path.exists(path):
+            raise requests.ConnectionError(f"No recorded response left for {method.upper()} {url} in {self.directory}")
+
+        with open(path, 'rb') as file:
+            metadata_line, body = gzip.decompress(file.read()).split(b'\n', 1)
+        metadata = json.loads(metadata_line)
+        response = requests.Response()
+        response.status_code = metadata['status_code']
+        response.reason = metadata['reason']
+        response.headers = CaseInsensitiveDict(metadata['headers'])
+        response.url = metadata['url']
+        response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response, metadata['duration']
@@ -0,0 +1,210 @@
+from collections import defaultdict
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import sys
+import threading
+import time
+from pymongo import monitoring
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms rendered in the Prometheus text format."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.types = {}
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.histograms = {}
+
+    def describe(self, name, metric_type, help_text):
+        self.types[name] = metric_type
+        self.help[name] = help_text
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def set(self, name, labels, value):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0}
+            histogram = self.histograms[key]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name in sorted(self.types):
+                lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {self.types[name]}")
+                if self.types[name] in ('counter', 'gauge'):
+                    values = self.counters if self.types[name] == 'counter' else self.gauges
+                    for (metric_name, labels), value in sorted(values.items()):
+                        if metric_name == name:
+                            lines.append(f"{name}{format_labels(labels)} {value:g}")
+                else:
+                    for (metric_name, labels), histogram in sorted(self.histograms.items()):
+                        if metric_name != name:
+                            continue
+                        for bound, count in zip(DURATION_BUCKETS, histogram['buckets']):
+                            lines.append(f"{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                        lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']:.6f}")
+                        lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels) + "}"
+
+registry = MetricsRegistry()
+registry.describe('fyralath_span_seconds', 'histogram', "Duration of instrumented pipeline stages.")
+registry.describe('fyralath_upstream_requests_total', 'counter', "Upstream HTTP requests by host and status.")
+registry.describe('fyralath_upstream_bytes_total', 'counter', "Bytes downloaded from upstream hosts.")
+registry.describe('fyralath_cache_requests_total', 'counter', "API payload cache lookups by route and result.")
+registry.describe('fyralath_mongo_command_seconds', 'histogram', "MongoDB command latency by command name.")
+registry.describe('fyralath_job_runs_total', 'counter', "Scheduled job runs by job and result.")
+registry.describe('fyralath_job_duration_seconds', 'histogram', "Scheduled job run duration.")
+registry.describe('fyralath_job_records_total', 'counter', "Records processed by scheduled jobs.")
+registry.describe('fyralath_startup_seconds', 'gauge', "Seconds from process start until a startup phase completed.")
+
+@contextlib.contextmanager
+def span(stage):
+    """Times the enclosed block as a pipeline stage, e.g. fetch, parse, pricing, db_write or aggregation."""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe('fyralath_span_seconds', {'stage': stage}, time.perf_counter() - start_time)
+
+def record_upstream_response(host, status, size):
+    registry.inc('fyralath_upstream_requests_total', {'host': host, 'status': str(status)})
+    if size:
+        registry.inc('fyralath_upstream_bytes_total', {'host': host}, size)
+
+def record_cache_lookup(route, result):
+    """Counts a payload cache lookup, result is 'hit', 'stale' or 'miss'."""
+    registry.inc('fyralath_cache_requests_total', {'route': route, 'result': result})
+
+def record_job_run(job_name, success, duration, records):
+    registry.inc('fyralath_job_runs_total', {'job': job_name, 'result': 'success' if success else 'failure'})
+    registry.observe('fyralath_job_duration_seconds', {'job': job_name}, duration)
+    if isinstance(records, (int, float)):
+        registry.inc('fyralath_job_records_total', {'job': job_name}, records)
+
+def record_startup_phase(phase, seconds):
+    """Records when a startup phase completed, e.g. 'payloads_loaded' or 'first_response'."""
+    registry.set('fyralath_startup_seconds', {'phase': phase}, seconds)
+
+def render_metrics():
+    return registry.render()
+
+def start_metrics_server(port, routes):
+    """
+    Serves routes, a dict of path to a (content type, render function) pair, on a background thread.
+    Used by processes without the Flask API, e.g. the worker role. Returns the server.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in routes:
+                self.send_error(404)
+                return
+            content_type, render = routes[self.path]
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the worker log
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Records the latency of every MongoDB command, registered before any client is created."""
+    def __init__(self):
+        self.started_at = {}
+
+    def started(self, event):
+        self.started_at[(event.connection_id, event.request_id)] = time.perf_counter()
+
+    def succeeded(self, event):
+        self.record(event)
+
+    def failed(self, event):
+        self.record(event)
+
+    def record(self, event):
+        start_time = self.started_at.pop((event.connection_id, event.request_id), None)
+        if start_time is not None:
+            registry.observe('fyralath_mongo_command_seconds', {'command': event.command_name}, time.perf_counter() - start_time)
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval and writes the folded stacks,
+    the input format of flamegraph.pl and speedscope.
+    """
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, path):
+        self.stopped.set()
+        self.thread.join()
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in sorted(self.stacks.items()):
+                file.write(f"{stack} {count}\n")
+
+@contextlib.contextmanager
+def profile_run(name):
+    """Profiles the enclosed block when PROFILE_DIR is set, writing <PROFILE_DIR>/<name>-<timestamp>.folded."""
+    profile_dir = os.getenv('PROFILE_DIR')
+    if not profile_dir:
+        yield
+        return
+    os.makedirs(profile_dir, exist_ok=True)
+    profiler = SamplingProfiler(threading.get_ident(), float(os.getenv('PROFILE_INTERVAL', '0.005')))
+    profiler.start()
+    try:
+        yield
+    finally:
+        path = os.path.join(profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        profiler.stop(path)
+        print(f"Wrote profile of {name} to {path}")
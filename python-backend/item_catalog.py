@@ -0,0 +1,77 @@
+import numpy as np
+
+FYRALATH_ID = 206448
+FYRALATH_NAME = "Fyr'alath the Dreamrender"
+
+# Recipe served when no recipe is requested, it keeps the original collection names
+DEFAULT_RECIPE = "fyralath"
+
+# All commodity items we track prices for, in the order they are shown on the site
+ITEMS = [
+    {"name": "Shadowflame Essence", "id": 204464},
+    {"name": "Cosmic Ink", "id": 194755},
+    {"name": "Runed Writhebark", "id": 194863},
+    {"name": "Resonant Crystal", "id": 200113},
+    {"name": "Awakened Fire", "id": 190321},
+    {"name": "Awakened Earth", "id": 190316},
+    {"name": "Awakened Order", "id": 190324},
+    {"name": "Obsidian Cobraskin", "id": 205413},
+    {"name": "Mireslush Hide", "id": 193230},
+    {"name": "Zaralek Glowspores", "id": 204460},
+    {"name": "Dreaming Essence", "id": 208212},
+]
+
+# Crafted items whose cost is the sum of their reagents, keyed by recipe name
+RECIPES = {
+    "fyralath": {
+        "name": FYRALATH_NAME,
+        "id": FYRALATH_ID,
+        "reagents": {
+            204464: 10, 194755: 250, 194863: 50, 200113: 200,
+            190321: 150, 190316: 100, 190324: 50, 205413: 3,
+            193230: 50, 204460: 400, 208212: 5
+        }
+    }
+}
+
+class ItemCatalog:
+    def __init__(self, items=ITEMS, recipes=RECIPES):
+        self.items = items
+        self.recipes = recipes
+        self.item_ids = np.array([item["id"] for item in items], dtype=np.int64)
+        self.index_by_id = {item["id"]: index for index, item in enumerate(items)}
+        self.names_by_id = {item["id"]: item["name"] for item in items}
+        # Crafted items followed by their reagents, the order item prices are stored in
+        self.tracked_items = [{"name": recipe["name"], "id": recipe["id"]} for recipe in recipes.values()] + list(items)
+        self.tracked_index_by_id = {item["id"]: index for index, item in enumerate(self.tracked_items)}
+        # Dense (recipes x items) matrix, one row of amounts needed per recipe
+        self.recipe_keys = list(recipes.keys())
+        self.requirements = np.zeros((len(self.recipe_keys), len(items)), dtype=np.int64)
+        for row, recipe_key in enumerate(self.recipe_keys):
+            for item_id, amount_needed in recipes[recipe_key]["reagents"].items():
+                self.requirements[row, self.index_by_id[item_id]] = amount_needed
+
+    def __len__(self):
+        return len(self.items)
+
+    def requirements_vector(self, recipe_key=DEFAULT_RECIPE):
+        """Returns the amount needed of every catalog item for the given recipe."""
+        return self.requirements[self.recipe_keys.index(recipe_key)]
+
+    def reagent_items(self, recipe_key=DEFAULT_RECIPE):
+        """Returns the catalog items used by the given recipe with their amount needed, in catalog order."""
+        requirements = self.requirements_vector(recipe_key)
+        return [
+            {"name": item["name"], "id": item["id"], "amount_needed": int(requirements[index])}
+            for index, item in enumerate(self.items) if requirements[index] > 0
+        ]
+
+    def total_costs(self, prices):
+        """Returns the total cost of every recipe for a dense vector (or items x N matrix) of item prices."""
+        return self.requirements @ prices
+
+    def total_cost(self, prices, recipe_key=DEFAULT_RECIPE):
+        """Returns the total cost of a single recipe for a dense vector of item prices."""
+        return self.requirements_vector(recipe_key) @ prices
+
+catalog = ItemCatalog()
@@ -0,0 +1,176 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import instrumentation
+
+class Job:
+    def __init__(self, name, func, interval, jitter=0, lock_timeout=timedelta(hours=1)):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.lock_timeout = lock_timeout
+        # Each job type gets its own pool so a slow job never blocks another one
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.lock = threading.Lock()
+        self.future = None
+        # The metrics are updated by the job's worker and the scheduler while the api reads them
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            'runs': 0,
+            'successes': 0,
+            'failures': 0,
+            'skipped': 0,
+            'running': False,
+            'last_started': None,
+            'last_duration': None,
+            'last_records': None,
+            'last_success': None,
+            'last_error': None
+        }
+
+class JobRunner:
+    """
+    Runs scheduled jobs in their own worker pools with single-flight locking, jitter and catch-up of missed runs.
+    With JOB_LOCK_BACKEND=mongo the single-flight lock is also held in MongoDB so several instances can run side by side,
+    a running job renews it every third of its lock timeout so a long run never loses it.
+    """
+    def __init__(self, db_manager, lock_backend=None):
+        self.db_manager = db_manager
+        self.lock_backend = lock_backend or os.getenv('JOB_LOCK_BACKEND', 'local')
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs = {}
+
+    def register(self, name, func, interval, jitter=0, lock_timeout=timedelta(hours=1)):
+        """Registers a job, func may return the number of records it processed."""
+        self.jobs[name] = Job(name, func, interval, jitter, lock_timeout)
+
+    def submit(self, name):
+        """Queues a run of the job without blocking the caller, runs are skipped while the job is already running."""
+        job = self.jobs[name]
+        if job.future is not None and not job.future.done():
+            print(f"Job {name} is still queued or running. Skipping this run.")
+            with job.metrics_lock:
+                job.metrics['skipped'] += 1
+            return None
+        job.future = job.executor.submit(self.run_job, job)
+        return job.future
+
+    def catch_up(self):
+        """
+        Submits every job whose last successful run is older than its interval, e.g. after downtime.
+        A job that never ran has not missed anything, its first start is recorded and it waits for its schedule.
+        """
+        for name, job in self.jobs.items():
+            last_run = self.db_manager.get_last_successful_job_run(name)
+            if last_run is None and self.db_manager.get_last_job_run(name) is None:
+                print(f"Job {name} has never run. Recording the first start instead of catching up.")
+                self.db_manager.save_job_run({
+                    'name': name,
+                    'owner': self.owner,
+                    'started_at': datetime.utcnow(),
+                    'duration': 0,
+                    'success': True,
+                    'records': None,
+                    'error': None,
+                    'seeded': True
+                })
+                continue
+            if last_run is None or datetime.utcnow() - last_run['started_at'] > job.interval:
+                print(f"Job {name} missed its last run. Catching up.")
+                self.submit(name)
+
+    def acquire_lock(self, job):
+        if not job.lock.acquire(blocking=False):
+            return False
+        if self.lock_backend == 'mongo' and not self.db_manager.acquire_job_lock(job.name, self.owner, job.lock_timeout):
+            job.lock.release()
+            return False
+        return True
+
+    def renew_lock(self, job, stopped):
+        """Extends the job's MongoDB lock until stopped is set."""
+        while not stopped.wait(job.lock_timeout.total_seconds() / 3):
+            try:
+                if not self.db_manager.renew_job_lock(job.name, self.owner, job.lock_timeout):
+                    print(f"Job {job.name} lost its lock while running.")
+                    return
+            except Exception as e:
+                print(f"Error renewing the lock of job {job.name}: {e}")
+
+    def release_lock(self, job):
+        if self.lock_backend == 'mongo':
+            self.db_manager.release_job_lock(job.name, self.owner)
+        job.lock.release()
+
+    def run_job(self, job):
+        if job.jitter:
+            time.sleep(random.uniform(0, job.jitter))
+
+        if not self.acquire_lock(job):
+            print(f"Job {job.name} is locked by another run. Skipping.")
+            with job.metrics_lock:
+                job.metrics['skipped'] += 1
+            return
+
+        heartbeat_stopped = threading.Event()
+        if self.lock_backend == 'mongo':
+            threading.Thread(target=self.renew_lock, args=(job, heartbeat_stopped), daemon=True, name=f"{job.name}-heartbeat").start()
+        started_at = datetime.utcnow()
+        start_time = time.perf_counter()
+        with job.metrics_lock:
+            job.metrics['running'] = True
+            job.metrics['last_started'] = started_at
+        records, error = None, None
+        try:
+            with instrumentation.profile_run(job.name):
+                records = job.func()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"Job {job.name} failed: {error}")
+            traceback.print_exc()
+        finally:
+            duration = time.perf_counter() - start_time
+            heartbeat_stopped.set()
+            self.release_lock(job)
+
+        with job.metrics_lock:
+            job.metrics['running'] = False
+            job.metrics['runs'] += 1
+            job.metrics['last_duration'] = round(duration, 3)
+            job.metrics['last_records'] = records
+            job.metrics['last_error'] = error
+            if error is None:
+                job.metrics['successes'] += 1
+                job.metrics['last_success'] = started_at
+            else:
+                job.metrics['failures'] += 1
+
+        instrumentation.record_job_run(job.name, error is None, duration, records)
+        print(f"Job {job.name} finished in {duration:.2f}s, success: {error is None}, records: {records}")
+        self.db_manager.save_job_run({
+            'name': job.name,
+            'owner': self.owner,
+            'started_at': started_at,
+            'duration': duration,
+            'success': error is None,
+            'records': records,
+            'error': error
+        })
+
+    def get_metrics(self):
+        """Returns the metrics of every registered job."""
+        metrics = {}
+        for name, job in self.jobs.items():
+            with job.metrics_lock:
+                metrics[name] = dict(job.metrics)
+        return metrics
+
+    def shutdown(self, wait=True):
+        for job in self.jobs.values():
+            job.executor.shutdown(wait=wait)
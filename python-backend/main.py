@@ -1,13 +1,27 @@
+import argparse
 from datetime import datetime, timedelta
-from flask import Flask, request
+from functools import lru_cache
+from bson import ObjectId
+from dotenv import load_dotenv
+from flask import Flask, Response, request, abort
 from flask_caching import Cache
 from flask_cors import CORS
 import json
+import os
 from acquisition_data_aggregator import AcquisitionDataAggregator
 from auction_data_aggregator import AuctionDataAggregator
-from auction_data_fetcher import AuctionDataFetcher
-from mongodb_manager import MongoDBManager
+from auction_data_sampler import AuctionDataSampler
+from item_catalog import catalog, DEFAULT_RECIPE
+from api_payloads import DAILY_AVERAGE_PERIODS, HISTORY_PERIODS, format_current_payload, format_history_payload, format_history_delta_payload, parse_history_cursor, format_acquisition_payload, format_price_statistics_payload
+from mongodb_manager import MongoDBManager, REGIONS, DATA_TOPICS, close_clients
+from data_update_notifier import create_notifier
+from payload_cache import PayloadCache
+from static_exporter import StaticExporter, get_static_export_name
+from payload_snapshot import PayloadSnapshot
+import instrumentation
+from job_runner import JobRunner
 from acquisition_data_fetcher import AcquisitionDataFetcher
+from acquisition_cube import parse_cube_query, load_cube_payload
 import schedule
 import threading
 import time
@@ -15,143 +29,392 @@ import socket
 import pytz
 from waitress import serve
 
+def get_cache_config(cache_backend):
+    """Returns the flask_caching config, redis and filesystem caches are shared by every api process."""
+    if cache_backend == 'redis':
+        return {'CACHE_TYPE': 'redis', 'CACHE_REDIS_URL': os.getenv('REDIS_URL', 'redis://localhost:6379/0')}
+    if cache_backend == 'filesystem':
+        return {'CACHE_TYPE': 'filesystem', 'CACHE_DIR': os.getenv('CACHE_DIR', './cache')}
+    return {'CACHE_TYPE': 'simple'}
+
+# Startup phases are reported relative to the import of the app
+process_started = time.perf_counter()
+load_dotenv()
+cache_backend = os.getenv('CACHE_BACKEND', 'simple')
 app = Flask(__name__)
 CORS(app)
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
+cache = Cache(app, config=get_cache_config(cache_backend))
+notifier = create_notifier(cache_backend)
+payload_cache = PayloadCache(ttl=int(os.getenv('PAYLOAD_CACHE_TTL', '300')), max_entries=int(os.getenv('PAYLOAD_CACHE_MAX_ENTRIES', '128')))
 db_manager = MongoDBManager()
+# The jobs use their own pool with a stricter write concern, so a long import never starves the api of connections
+ingest_db_manager = MongoDBManager(workload='ingest')
+auction_sampler = AuctionDataSampler()
+job_runner = JobRunner(ingest_db_manager)
+price_snapshot_history = int(os.getenv('PRICE_SNAPSHOT_HISTORY', '24'))
+static_export_dir = os.getenv('STATIC_EXPORT_DIR', '')
+static_exporter = StaticExporter(static_export_dir) if static_export_dir else None
+payload_snapshot_path = os.getenv('PAYLOAD_SNAPSHOT_PATH', './cache/payload_snapshot.json.gz')
+payload_snapshot = PayloadSnapshot(payload_snapshot_path) if payload_snapshot_path else None
+payload_snapshot_interval = int(os.getenv('PAYLOAD_SNAPSHOT_INTERVAL', '60'))
+saved_snapshot_signature = None
+# The data version and payload of every cached payload, saved with it in the snapshot
+payload_versions = {}
+first_response_served = False
 
 def fetch_auction_data():
     print("Fetching auction data...")
-    auction_fetcher = AuctionDataFetcher()
-    result = auction_fetcher.run()
+    result = auction_sampler.run()
 
     if result is None:
-        print("Error fetching auction data. Skipping saving to database.")
-        return
+        print("No new auction data. Skipping saving to database.")
+        return 0
     
     print("Data fetched successfully. Saving to database.")
-    db_manager.save_latest_item_prices(result)
-
-    for entry in result['data']:
-        # check if we should save the total costs
-        total_costs_exists = db_manager.check_timestamp_exists_in_total_costs(entry['region'], result['timestamp'])
-        print(f"Checking if total costs exists for {entry['region']} on {result['timestamp']}: {total_costs_exists}")
-        if not total_costs_exists:
-            for item in entry["items"]:
-                if "amount_needed" in item:
-                    del item["amount_needed"]
-            data_with_timestamp = {
-                'timestamp': result['timestamp'],
-                'items': entry['items']
-            }
-            print(f"Saving total costs for {entry['region']} on {result['timestamp']}")
-            db_manager.save_total_costs(entry['region'], data_with_timestamp)
-        
-        # check if we should calculate yesterdays daily average
-        datetime_utc = datetime.fromtimestamp(result['timestamp'] / 1000, pytz.utc)
-        date_before_utc = datetime_utc - timedelta(days=1)
-        date_before_utc = date_before_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-        timestamp_for_day = int(date_before_utc.timestamp()) * 1000
-        daily_average_exists = db_manager.check_date_exists_in_daily_average(entry['region'], timestamp_for_day)
-        print(f"Checking if daily average exists for {entry['region']} on {timestamp_for_day} / {date_before_utc.strftime('%Y-%m-%d')}: {daily_average_exists}")
-        if not daily_average_exists:
-            previous_data = db_manager.get_total_costs_from_previous_day(entry['region'], timestamp_for_day)
-            data_aggregator = AuctionDataAggregator()
-            daily_averages = data_aggregator.aggregate_data_and_generate_output(previous_data, timestamp_for_day)
-            print(f"Saving daily average for {entry['region']} on {date_before_utc.strftime('%Y-%m-%d')}: {daily_averages}")
-            if daily_averages:
-                db_manager.save_daily_average(entry['region'], daily_averages)
+    changes = result.pop('changes')
+    with instrumentation.span('db_write'):
+        ingest_db_manager.save_latest_item_prices(result, keep_snapshots=price_snapshot_history)
+
+        for region, region_changes in changes.items():
+            ingest_db_manager.save_price_changes(region, {'timestamp': result['sampled_at'], 'changes': region_changes})
 
-    cache.clear()
+        for region in auction_sampler.statistics.regions:
+            ingest_db_manager.save_price_statistics(auction_sampler.statistics.to_document(region))
+
+    records = 0
+    for recipe_key, recipe_data in result['recipes'].items():
+        for entry in recipe_data:
+            save_recipe_costs(recipe_key, entry, result['timestamp'])
+            records += 1
+
+    notifier.publish('prices')
+    export_static_payloads('prices')
     print("Auction data fetched successfully")
+    return records
+
+def save_recipe_costs(recipe_key, entry, timestamp):
+    region = entry['region']
+    # check if we should save the total costs
+    total_costs_exists = ingest_db_manager.check_timestamp_exists_in_total_costs(region, timestamp, recipe_key)
+    print(f"Checking if {recipe_key} total costs exists for {region} on {timestamp}: {total_costs_exists}")
+    if not total_costs_exists:
+        items = [{key: value for key, value in item.items() if key != "amount_needed"} for item in entry["items"]]
+        data_with_timestamp = {
+            'timestamp': timestamp,
+            'items': items
+        }
+        print(f"Saving {recipe_key} total costs for {region} on {timestamp}")
+        with instrumentation.span('db_write'):
+            ingest_db_manager.save_total_costs(region, data_with_timestamp, recipe_key)
+    
+    # check if we should calculate yesterdays daily average
+    datetime_utc = datetime.fromtimestamp(timestamp / 1000, pytz.utc)
+    date_before_utc = datetime_utc - timedelta(days=1)
+    date_before_utc = date_before_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+    timestamp_for_day = int(date_before_utc.timestamp()) * 1000
+    daily_average_exists = ingest_db_manager.check_date_exists_in_daily_average(region, timestamp_for_day, recipe_key)
+    print(f"Checking if {recipe_key} daily average exists for {region} on {timestamp_for_day} / {date_before_utc.strftime('%Y-%m-%d')}: {daily_average_exists}")
+    if not daily_average_exists:
+        previous_data = ingest_db_manager.get_total_costs_from_previous_day(region, timestamp_for_day, recipe_key)
+        with instrumentation.span('aggregation'):
+            data_aggregator = AuctionDataAggregator()
+            daily_averages = data_aggregator.aggregate_data_and_generate_output(previous_data, timestamp_for_day)
+        print(f"Saving {recipe_key} daily average for {region} on {date_before_utc.strftime('%Y-%m-%d')}: {daily_averages}")
+        if daily_averages:
+            with instrumentation.span('db_write'):
+                ingest_db_manager.save_daily_average(region, daily_averages, recipe_key)
 
 def fetch_acquisition_data():
     acquisition_fetcher = AcquisitionDataFetcher()
-    acquisition_fetcher.update_characters_data()
-    acquisition_aggregator = AcquisitionDataAggregator()
-    acquisition_aggregator.aggregate_data()
+    updated_characters = acquisition_fetcher.update_characters_data()
+    with instrumentation.span('aggregation'):
+        acquisition_aggregator = AcquisitionDataAggregator()
+        acquisition_aggregator.aggregate_data()
+    notifier.publish('acquisitions')
+    export_static_payloads('acquisitions')
+    return updated_characters
+
+def compact_total_costs():
+    # The daily average job still reads yesterday's raw hours
+    raw_days = max(total_costs_raw_days, 2)
+    compacted = 0
+    for recipe_key in catalog.recipe_keys:
+        for region in REGIONS:
+            compacted += ingest_db_manager.compact_total_costs(region, raw_days, recipe_key)
+    print(f"Compacted {compacted} hourly total costs older than {raw_days} days")
+    return compacted
+
+# Sample the auction house every few minutes, unchanged dumps only cost a 304
+sample_interval_minutes = int(os.getenv('SAMPLE_INTERVAL_MINUTES', '10'))
+job_runner.register('fetch_auction_data', fetch_auction_data, timedelta(minutes=sample_interval_minutes), jitter=30)
+job_runner.register('fetch_acquisition_data', fetch_acquisition_data, timedelta(weeks=1), jitter=300, lock_timeout=timedelta(hours=12))
+total_costs_raw_days = int(os.getenv('TOTAL_COSTS_RAW_DAYS', '14'))
+job_runner.register('compact_total_costs', compact_total_costs, timedelta(days=1), jitter=60, lock_timeout=timedelta(hours=1))
 
-# Schedule the task to run every hour
-schedule.every().hour.do(fetch_auction_data)
-schedule.every().tuesday.at("04:00").do(fetch_acquisition_data)
+# The scheduler only queues the jobs, they run in their own worker pools
+schedule.every(sample_interval_minutes).minutes.do(job_runner.submit, 'fetch_auction_data')
+schedule.every().tuesday.at("04:00").do(job_runner.submit, 'fetch_acquisition_data')
+schedule.every().day.at("03:00").do(job_runner.submit, 'compact_total_costs')
 
 # Create a separate thread to execute the scheduled tasks
 def run_scheduler():
+    # Resume the rolling price statistics instead of waiting for a full window of new hours
+    for document in ingest_db_manager.get_price_statistics(include_state=True):
+        auction_sampler.statistics.load_document(document)
+    ingest_db_manager.ensure_job_run_indexes(int(os.getenv('JOB_RUNS_RETENTION_DAYS', '30')))
+    job_runner.catch_up()
     while True:
         schedule.run_pending()
         time.sleep(1)
 
+def get_requested_recipe():
+    """Returns the recipe from the 'recipe' query parameter, defaulting to Fyr'alath."""
+    recipe = request.args.get('recipe', DEFAULT_RECIPE)
+    if recipe not in catalog.recipes:
+        abort(404)
+    return recipe
+
+def build_current_payload(recipe):
+    latest = db_manager.get_latest_item_prices()
+    return format_current_payload(latest, recipe)
+
+def get_history(period, recipe, since=None):
+    if period in DAILY_AVERAGE_PERIODS:
+        return db_manager.get_all_daily_averages(period, recipe, since)
+    return db_manager.get_all_total_costs(period, recipe, since)
+
+def build_history_payload(period, recipe):
+    return format_history_payload(get_history(period, recipe))
+
+def get_history_response(period):
+    """
+    Returns the history of the period, or with a 'since' timestamp or cursor only the newer entries and the next cursor.
+    Delta responses differ per client so they skip the payload cache and use the timestamp index instead.
+    """
+    recipe = get_requested_recipe()
+    since = request.args.get('since')
+    if since is None:
+        return get_cached_payload(f'history_data_{period}_{recipe}', lambda: build_history_payload(period, recipe))
+    try:
+        since = parse_history_cursor(since)
+    except ValueError:
+        abort(400)
+    return format_history_delta_payload(get_history(period, recipe, since), since)
+
+def build_acquisition_payload():
+    summary = db_manager.get_all_acquisitions("summary")
+    daily = db_manager.get_all_acquisitions("daily")
+    cumulative = db_manager.get_all_acquisitions("cumulative")
+    return format_acquisition_payload(summary, daily, cumulative)
+
+def build_acquisition_cube_payload():
+    cube = db_manager.get_all_acquisitions("cube")
+    return json.dumps(cube[0] if cube else None)
+
+# The parsed cube is reused for as long as the cached payload does not change
+get_acquisition_cube = lru_cache(maxsize=1)(load_cube_payload)
+
+def build_price_statistics_payload():
+    return format_price_statistics_payload(db_manager.get_price_statistics())
+
+def get_topic_payloads(topic):
+    """Returns the cache keys and payload builders that depend on the given data topic."""
+    if topic == 'acquisitions':
+        return {'acquisition_data': build_acquisition_payload, 'acquisition_cube': build_acquisition_cube_payload}
+    payloads = {'price_statistics': build_price_statistics_payload}
+    for recipe in catalog.recipe_keys:
+        payloads[f'current_data_{recipe}'] = lambda recipe=recipe: build_current_payload(recipe)
+        for period in HISTORY_PERIODS:
+            payloads[f'history_data_{period}_{recipe}'] = lambda period=period, recipe=recipe: build_history_payload(period, recipe)
+    return payloads
+
+def get_payload_topic(cache_key):
+    """Returns the data topic the cache key's payload is built from, the inverse of get_topic_payloads."""
+    return 'acquisitions' if cache_key.startswith('acquisition') else 'prices'
+
+def build_versioned_payload(cache_key, builder):
+    """
+    Builds a payload together with the data version it was built from.
+    The version is read first, so data replaced during the build can only make the payload look outdated, never newer.
+    """
+    version = db_manager.get_data_version(get_payload_topic(cache_key))
+    return version, builder()
+
+def remember_payload_version(cache_key, entry):
+    """Keeps the version of a payload about to be cached and returns the payload."""
+    version, data = entry
+    payload_versions[cache_key] = (version, data)
+    return data
+
+def load_shared_payload(cache_key, builder):
+    # The shared cache holds (version, payload) pairs, so payloads built by another process keep their version
+    entry = cache.get(cache_key)
+    # Entries cached before payloads were versioned are plain payloads and rebuilt once
+    if not isinstance(entry, tuple):
+        entry = build_versioned_payload(cache_key, builder)
+        cache.set(cache_key, entry, timeout=None)
+    return remember_payload_version(cache_key, entry)
+
+def rebuild_shared_payload(cache_key, builder):
+    entry = build_versioned_payload(cache_key, builder)
+    cache.set(cache_key, entry, timeout=None)
+    return remember_payload_version(cache_key, entry)
+
+def get_export_payload(cache_key, builder):
+    """
+    Returns the payload of the cache key built from the current data, reusing the payload just refreshed by this process
+    or the one in the shared cache, and only building it if neither was built from the current data version.
+    """
+    payload_cache.wait_for_refresh(cache_key)
+    version = db_manager.get_data_version(get_payload_topic(cache_key))
+    versioned = payload_versions.get(cache_key)
+    if versioned is not None and versioned[0] == version:
+        return versioned[1]
+    entry = cache.get(cache_key)
+    if isinstance(entry, tuple) and entry[0] == version:
+        return entry[1]
+    return builder()
+
+def export_static_payloads(topic):
+    """Writes the topic's payloads as static files when STATIC_EXPORT_DIR is set, a failed export never fails the job."""
+    if static_exporter is None:
+        return
+    try:
+        payloads = {get_static_export_name(cache_key): get_export_payload(cache_key, builder) for cache_key, builder in get_topic_payloads(topic).items()}
+        static_exporter.export(payloads)
+    except Exception as e:
+        print(f"Error exporting static payloads for {topic}: {e}")
+
+def get_cached_payload(cache_key, builder):
+    # The in-process payload cache sits in front of the shared cache, so concurrent misses query the DB once
+    return payload_cache.get(cache_key, lambda: load_shared_payload(cache_key, builder))
+
+def refresh_payloads(topic):
+    """Rebuilds the cached payloads of an updated topic in the background, readers keep the old payload until then."""
+    print(f"Data updated for {topic}, refreshing cached payloads.")
+    for cache_key, builder in get_topic_payloads(topic).items():
+        payload_cache.refresh(cache_key, lambda cache_key=cache_key, builder=builder: rebuild_shared_payload(cache_key, builder))
+
+def save_payload_snapshot():
+    """
+    Writes the cached payloads of every topic, each with the data version it was built from, to the snapshot file
+    if they changed since the last save. Payloads whose version is not known yet are left out.
+    """
+    global saved_snapshot_signature
+    if payload_snapshot is None:
+        return
+    try:
+        topic_payloads = {}
+        for topic in DATA_TOPICS:
+            topic_payloads[topic] = {}
+            for cache_key in get_topic_payloads(topic):
+                entry = payload_cache.lookup(cache_key)
+                versioned = payload_versions.get(cache_key)
+                # The version is kept before the payload is cached, so only save it once the cache holds that same payload
+                if entry is not None and versioned is not None and versioned[1] is entry[0]:
+                    topic_payloads[topic][cache_key] = versioned
+        signature = tuple((cache_key, version, id(payload)) for payloads in topic_payloads.values() for cache_key, (version, payload) in payloads.items())
+        if signature != saved_snapshot_signature:
+            payload_snapshot.save(topic_payloads)
+            saved_snapshot_signature = signature
+    except Exception as e:
+        print(f"Error saving payload snapshot: {e}")
+
+def load_payload_snapshot():
+    """
+    Seeds the payload cache from the snapshot before the API accepts traffic.
+    Topics missing from the snapshot or whose data changed since are rebuilt in the background instead.
+    """
+    if payload_snapshot is None:
+        return
+    versions = db_manager.get_data_versions()
+    payloads, outdated_topics = payload_snapshot.load(versions)
+    for cache_key, (version, payload) in payloads.items():
+        payload_versions[cache_key] = (version, payload)
+        payload_cache.set(cache_key, payload)
+    for topic in outdated_topics:
+        refresh_payloads(topic)
+    seconds = time.perf_counter() - process_started
+    instrumentation.record_startup_phase('payloads_loaded', seconds)
+    print(f"Loaded {len(payloads)} payloads from the snapshot {seconds:.3f} s after start, rebuilding {sorted(outdated_topics)}")
+
+def run_payload_snapshot_saver():
+    while True:
+        time.sleep(payload_snapshot_interval)
+        save_payload_snapshot()
+
+@app.after_request
+def record_first_response(response):
+    global first_response_served
+    if not first_response_served:
+        first_response_served = True
+        seconds = time.perf_counter() - process_started
+        instrumentation.record_startup_phase('first_response', seconds)
+        print(f"Served the first response {seconds:.3f} s after start")
+    return response
+
 @app.route('/api/data/current', methods=['GET'])
 def get_current_data():
-    cache_key = 'current_data'
-    data = cache.get(cache_key)
-    if data is None:
-        data = db_manager.get_latest_item_prices()
-        data = json.dumps(data, default=str)
-        cache.set(cache_key, data, timeout=None)
-    return data
+    recipe = get_requested_recipe()
+    return get_cached_payload(f'current_data_{recipe}', lambda: build_current_payload(recipe))
 
 @app.route('/api/data/history/all', methods=['GET'])
 def get_history_data_all():
-    cache_key = 'history_data_all'
-    data = cache.get(cache_key)
-    if data is None:
-        all = db_manager.get_all_daily_averages("all")
-        data = json.dumps(all, default=str)
-        cache.set(cache_key, data, timeout=None)
-    return data
+    return get_history_response("all")
 
 
 @app.route('/api/data/history/month', methods=['GET'])
 def get_history_data_month():
-    cache_key = 'history_data_month'
-    data = cache.get(cache_key)
-    if data is None:
-        month = db_manager.get_all_daily_averages("month")
-        data = json.dumps(month, default=str)
-        cache.set(cache_key, data, timeout=None)
-    return data
+    return get_history_response("month")
 
 
 @app.route('/api/data/history/week', methods=['GET'])
 def get_history_data_week():
-    cache_key = 'history_data_week'
-    data = cache.get(cache_key)
-    if data is None:
-        week = db_manager.get_all_total_costs("week")
-        data = json.dumps(week, default=str)
-        cache.set(cache_key, data, timeout=None)
-    else:
-        print("Returning cached current data.")
-    return data
+    return get_history_response("week")
 
 
 @app.route('/api/data/history/day', methods=['GET'])
 def get_history_data_day():
-    cache_key = 'history_data_day'
-    data = cache.get(cache_key)
-    if data is None:
-        day = db_manager.get_all_total_costs("day")
-        data = json.dumps(day, default=str)
-        cache.set(cache_key, data, timeout=None)
-    return data
+    return get_history_response("day")
 
 @app.route('/api/data/acquisitions', methods=['GET'])
 def get_acquisition_data():
-    cache_key = 'acquisition_data'
-    data = cache.get(cache_key)
-    if data is None:
-        summary = db_manager.get_all_acquisitions("summary")
-        daily = db_manager.get_all_acquisitions("daily")
-        cumulative = db_manager.get_all_acquisitions("cumulative")
-        data = {
-            "summary": summary,
-            "daily": daily,
-            "cumulative": cumulative
-        }
-        data = json.dumps(data, default=str)
-        cache.set(cache_key, data, timeout=None)
-    return data
+    return get_cached_payload('acquisition_data', build_acquisition_payload)
+
+@app.route('/api/data/acquisitions/cube', methods=['GET'])
+def get_acquisition_cube_data():
+    try:
+        filters, group_by = parse_cube_query(request.args)
+    except ValueError:
+        abort(400)
+    cube = get_acquisition_cube(get_cached_payload('acquisition_cube', build_acquisition_cube_payload))
+    return json.dumps(cube.query(filters, group_by))
+
+@app.route('/api/data/statistics', methods=['GET'])
+def get_price_statistics():
+    return get_cached_payload('price_statistics', build_price_statistics_payload)
+
+METRICS_MIMETYPE = 'text/plain; version=0.0.4'
+
+def render_job_status():
+    return json.dumps(job_runner.get_metrics(), default=str)
+
+@app.route('/api/status/jobs', methods=['GET'])
+def get_job_status():
+    return render_job_status()
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(instrumentation.render_metrics(), mimetype=METRICS_MIMETYPE)
+
+def start_worker_metrics_server():
+    """The worker role has no Flask app, so its job and pipeline metrics are served on METRICS_PORT instead."""
+    port = int(os.getenv('METRICS_PORT', '9100'))
+    instrumentation.start_metrics_server(port, {
+        '/metrics': (METRICS_MIMETYPE, instrumentation.render_metrics),
+        '/api/status/jobs': ('application/json', render_job_status)
+    })
+    print(f"Serving worker metrics on port {port}")
 
 def get_local_ip():
     """Function to get the local IP address of the machine."""
@@ -166,14 +429,76 @@ def get_local_ip():
         s.close()
     return IP
 
-if __name__ == '__main__':
-    print("Starting Flask app")
-    # Start the scheduler thread
-    scheduler_thread = threading.Thread(target=run_scheduler)
-    scheduler_thread.start()
-    #fetch_auction_data()
+def start_api():
     # Start the Flask app using the local IP address
+    db_manager.ensure_timestamp_indexes(catalog.recipe_keys)
+    load_payload_snapshot()
+    notifier.listen(refresh_payloads)
+    if payload_snapshot is not None:
+        threading.Thread(target=run_payload_snapshot_saver, daemon=True).start()
     print("Starting Flask app on " + get_local_ip())
     local_ip = '0.0.0.0'
-    port = 5000
-    serve(app, host=local_ip, port=port)
+    port = int(os.getenv('PORT', '5000'))
+    try:
+        serve(app, host=local_ip, port=port)
+    finally:
+        shutdown()
+
+def rollback_prices(snapshot_id=None):
+    """
+    Makes an earlier price snapshot current, by default the one before the current snapshot, and notifies the api processes.
+    Returns the ID of the snapshot that is now current, or None if there was nothing to roll back to.
+    """
+    current_snapshot_id = ingest_db_manager.rollback_latest_item_prices(snapshot_id)
+    if current_snapshot_id is None:
+        print("No earlier price snapshot to roll back to.")
+        return None
+    notifier.publish('prices')
+    export_static_payloads('prices')
+    print(f"Rolled back the current prices to snapshot {current_snapshot_id}")
+    return current_snapshot_id
+
+def shutdown():
+    save_payload_snapshot()
+    # Let a running job finish its writes before the shared clients are closed
+    job_runner.shutdown(wait=True)
+    close_clients()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fyr'alath data tracker backend")
+    parser.add_argument('--role', choices=['all', 'api', 'worker'], default=os.getenv('APP_ROLE', 'all'),
+                        help="'api' serves requests, 'worker' runs the scheduled ingestion jobs, 'all' does both")
+    parser.add_argument('--rollback-prices', nargs='?', const='previous', metavar='SNAPSHOT_ID',
+                        help="make the previous or the given price snapshot current, notify the api processes and exit")
+    args = parser.parse_args()
+
+    if args.rollback_prices is not None:
+        if cache_backend not in ('redis', 'filesystem'):
+            print(f"Warning: the '{cache_backend}' backend only notifies this process, running api processes keep serving their cached prices until they expire")
+        snapshot_id = None
+        if args.rollback_prices != 'previous':
+            if not ObjectId.is_valid(args.rollback_prices):
+                parser.error(f"Invalid snapshot ID: {args.rollback_prices}")
+            snapshot_id = ObjectId(args.rollback_prices)
+        try:
+            rollback_prices(snapshot_id)
+        finally:
+            close_clients()
+        raise SystemExit(0)
+    # Split roles run in separate processes, which only share data updates through redis or the filesystem
+    if args.role != 'all' and cache_backend not in ('redis', 'filesystem'):
+        parser.error(f"--role {args.role} needs CACHE_BACKEND=redis or filesystem, the '{cache_backend}' backend only notifies its own process")
+
+    if args.role == 'worker':
+        print("Starting worker")
+        start_worker_metrics_server()
+        run_scheduler()
+    elif args.role == 'api':
+        print("Starting Flask app")
+        start_api()
+    else:
+        print("Starting Flask app")
+        # Start the scheduler thread
+        scheduler_thread = threading.Thread(target=run_scheduler)
+        scheduler_thread.start()
+        start_api()
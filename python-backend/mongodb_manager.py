@@ -1,20 +1,131 @@
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, ReplaceOne, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, OperationFailure
 from dotenv import load_dotenv
+import atexit
+from itertools import groupby
 import os
+import threading
 
 import pytz
 
+from item_catalog import DEFAULT_RECIPE
+from total_costs_compactor import DAY_MS, get_day_timestamp, get_compaction_cutoff, build_day_bucket, expand_day_bucket, get_bucket_query, stitch_total_costs
+import instrumentation
+
+# The environment is read once per process, not on every client or manager construction
+load_dotenv()
+
+# Listeners only apply to clients created after registering
+monitoring.register(instrumentation.MongoCommandTimer())
+
+REGIONS = ['us', 'eu', 'kr', 'tw']
+# Fixed key of the current snapshot in 'latest_item_prices', older snapshots are kept in 'item_price_snapshots'
+CURRENT_SNAPSHOT_ID = 'current'
+# Topics of the data update notifications, every cached payload is built from one of them
+DATA_TOPICS = ('prices', 'acquisitions')
+
+# Client settings per workload, each can be overridden with MONGODB_<WORKLOAD>_<SETTING>
+WORKLOAD_CLIENT_SETTINGS = {
+    # Ingestion writes few large batches and must not lose them
+    'ingest': {'max_pool_size': 10, 'min_pool_size': 0, 'connect_timeout_ms': 10000, 'server_selection_timeout_ms': 30000,
+               'socket_timeout_ms': 120000, 'read_preference': 'primary', 'write_concern': 'majority'},
+    # The API serves many small concurrent reads and should fail fast
+    'api': {'max_pool_size': 100, 'min_pool_size': 5, 'connect_timeout_ms': 5000, 'server_selection_timeout_ms': 5000,
+            'socket_timeout_ms': 10000, 'read_preference': 'primaryPreferred', 'write_concern': '1'},
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client_options(workload='api'):
+    """Returns the MongoClient keyword arguments for a workload, applying any environment overrides."""
+    settings = dict(WORKLOAD_CLIENT_SETTINGS[workload])
+    for setting in settings:
+        override = os.getenv(f'MONGODB_{workload.upper()}_{setting.upper()}')
+        if override:
+            settings[setting] = override
+
+    write_concern = settings['write_concern']
+    return {
+        'maxPoolSize': int(settings['max_pool_size']),
+        'minPoolSize': int(settings['min_pool_size']),
+        'connectTimeoutMS': int(settings['connect_timeout_ms']),
+        'serverSelectionTimeoutMS': int(settings['server_selection_timeout_ms']),
+        'socketTimeoutMS': int(settings['socket_timeout_ms']),
+        'readPreference': settings['read_preference'],
+        'w': int(write_concern) if write_concern.isdigit() else write_concern,
+    }
+
+def get_client(workload='api'):
+    """
+    Returns the process-wide MongoClient for a workload, creating and pinging it on first use.
+    Every MongoDBManager of the same workload shares the client and its connection pool.
+    """
+    connection_string = os.getenv('MONGODB_CONNECTION_STRING', '')
+    key = (connection_string, workload)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MongoClient(connection_string, **get_client_options(workload))
+            try:
+                # Check if the server is available
+                client.admin.command('ping')
+            except Exception:
+                # An uncached client would leak its pool and monitor threads on every retry
+                client.close()
+                raise
+            _clients[key] = client
+        return client
+
+@atexit.register
+def close_clients():
+    """Closes every shared client, called on interpreter exit and by the servers' shutdown hooks."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+def recipe_collection_name(collection_prefix, region, recipe=DEFAULT_RECIPE):
+    """Returns the region's collection name for a recipe, the default recipe keeps the original names."""
+    if recipe == DEFAULT_RECIPE:
+        return f"{collection_prefix}_{region}"
+    return f"{collection_prefix}_{recipe}_{region}"
+
+def get_period_query(period="all", since=None):
+    """
+    Returns the timestamp query for the given time period, optionally only for timestamps newer than since.
+    Period can be 'day', 'week', 'month', or 'all'. Defaults to 'all'.
+    """
+    current_time = datetime.utcnow()
+    if period == "day":
+        start_time = current_time - timedelta(days=1)
+    elif period == "week":
+        start_time = current_time - timedelta(weeks=1)
+    elif period == "month":
+        start_time = current_time - timedelta(days=30)
+    else:  # 'all' or any other value defaults to fetching all records
+        start_time = None
+
+    query = {}
+    if start_time:
+        query["timestamp"] = {"$gte": int(start_time.timestamp() * 1000)}
+    if since is not None:
+        query.setdefault("timestamp", {})["$gt"] = since
+    return query
+
+def get_region_since(since, region):
+    """Returns the since timestamp of a region from a shared timestamp or a dict of region to timestamp."""
+    if isinstance(since, dict):
+        return since.get(region, 0)
+    return since
+
 class MongoDBManager:
-    def __init__(self):
+    def __init__(self, workload='api'):
+        """Workload is 'ingest' for the scheduled jobs or 'api' for serving requests, see WORKLOAD_CLIENT_SETTINGS."""
         try:
-            load_dotenv()
-            connection_string = os.getenv('MONGODB_CONNECTION_STRING', '')
             mongo_db_name = os.getenv('MONGODB_DB_NAME', '')
-            self.client = MongoClient(connection_string)
-            # Check if the server is available
-            self.client.admin.command('ping')
+            self.client = get_client(workload)
             self.db = self.client[mongo_db_name]
         except ConnectionFailure as e:
             print(f"Connection to MongoDB failed: {e}")
@@ -57,27 +168,86 @@ class MongoDBManager:
         result = collection.insert_one(character_data)
         return result.inserted_id
 
-    def save_latest_item_prices(self, document):
-        """Replaces the existing document in 'latest_item_prices' with the new one."""
-        collection = self.db['latest_item_prices']
-        # Delete all documents in the collection
-        collection.delete_many({})
-        result = collection.insert_one(document)
-        return result.inserted_id
+    def save_latest_item_prices(self, document, keep_snapshots=24):
+        """
+        Saves the document as a new snapshot and swaps it in as the current one with a single replace,
+        so readers never see an empty collection. The previous keep_snapshots snapshots are kept for rollback.
+        """
+        snapshot = dict(document)
+        snapshot.pop('_id', None)
+        snapshot_id = self.db['item_price_snapshots'].insert_one(snapshot).inserted_id
+        self.set_current_item_prices(snapshot)
+
+        # Remove documents left over from before the fixed current key was used
+        self.db['latest_item_prices'].delete_many({'_id': {'$ne': CURRENT_SNAPSHOT_ID}})
+
+        old_snapshots = self.db['item_price_snapshots'].find({}, {'_id': 1}).sort('_id', DESCENDING).skip(keep_snapshots)
+        old_snapshot_ids = [old_snapshot['_id'] for old_snapshot in old_snapshots]
+        if old_snapshot_ids:
+            self.db['item_price_snapshots'].delete_many({'_id': {'$in': old_snapshot_ids}})
+        return snapshot_id
+
+    def set_current_item_prices(self, snapshot):
+        """Atomically replaces the current item prices with the given snapshot document."""
+        current = {key: value for key, value in snapshot.items() if key != '_id'}
+        current['_id'] = CURRENT_SNAPSHOT_ID
+        current['snapshot_id'] = snapshot['_id']
+        self.db['latest_item_prices'].replace_one({'_id': CURRENT_SNAPSHOT_ID}, current, upsert=True)
 
-    def save_region_data(self, collection_prefix, region, document):
+    def rollback_latest_item_prices(self, snapshot_id=None):
+        """
+        Makes an earlier snapshot current again, by default the one before the current snapshot.
+        Returns the ID of the snapshot that is now current, or None if there was nothing to roll back to.
+        """
+        if snapshot_id is None:
+            current = self.get_latest_item_prices()
+            query = {'_id': {'$lt': current['snapshot_id']}} if current and 'snapshot_id' in current else {}
+            snapshot = self.db['item_price_snapshots'].find_one(query, sort=[('_id', DESCENDING)])
+        else:
+            snapshot = self.db['item_price_snapshots'].find_one({'_id': snapshot_id})
+        if snapshot is None:
+            return None
+        self.set_current_item_prices(snapshot)
+        return snapshot['_id']
+
+    def save_region_data(self, collection_prefix, region, document, recipe=DEFAULT_RECIPE):
         """Saves data to the specified region's collection."""
-        collection_name = f"{collection_prefix}_{region}"
+        collection_name = recipe_collection_name(collection_prefix, region, recipe)
         collection = self.db[collection_name]
         result = collection.insert_one(document)
         return result.inserted_id
 
     def get_latest_item_prices(self):
-        """Retrieves the single document from 'latest_item_prices'."""
+        """Retrieves the current document from 'latest_item_prices'."""
         collection = self.db['latest_item_prices']
-        document = collection.find_one()
+        document = collection.find_one({'_id': CURRENT_SNAPSHOT_ID})
+        if document is None:
+            # Documents saved before the fixed current key have a generated ID
+            document = collection.find_one()
         return document
 
+    def save_price_statistics(self, document):
+        """Replaces the rolling price statistics of the document's region."""
+        self.db['price_statistics'].replace_one({'_id': document['region']}, document, upsert=True)
+
+    def get_price_statistics(self, include_state=False):
+        """Retrieves the rolling price statistics of every region, the resumable state only when requested."""
+        projection = {'_id': 0} if include_state else {'_id': 0, 'state': 0}
+        return list(self.db['price_statistics'].find({}, projection))
+
+    def get_data_version(self, topic):
+        """Returns an identifier of the 'prices' or 'acquisitions' data that changes whenever it is replaced, None if there is no data."""
+        if topic == 'prices':
+            collection = self.db['latest_item_prices']
+            latest = collection.find_one({'_id': CURRENT_SNAPSHOT_ID}, {'snapshot_id': 1}) or collection.find_one({}, {'snapshot_id': 1})
+            return str(latest.get('snapshot_id', latest['_id'])) if latest else None
+        summary = self.db['acquisitions_summary'].find_one({}, {'_id': 1})
+        return str(summary['_id']) if summary else None
+
+    def get_data_versions(self):
+        """Returns the version of every data topic."""
+        return {topic: self.get_data_version(topic) for topic in DATA_TOPICS}
+
     def get_all_region_data(self, collection_prefix):
         """Retrieves all documents from region-specific collections and returns them as a single JSON object."""
         regions = ['us', 'eu', 'kr', 'tw']
@@ -89,50 +259,72 @@ class MongoDBManager:
             all_data.append({"region": region, "data": documents})
         return all_data
 
-    def get_data_within_period(self, collection_name, period="all"):
+    def get_data_within_period(self, collection_name, period="all", recipe=DEFAULT_RECIPE, since=None):
         """
         Retrieves documents from a specified collection within the given time period.
         Period can be 'day', 'week', 'month', or 'all'. Defaults to 'all'.
+        With since only documents newer than that timestamp are returned, in timestamp order.
+        Since is a timestamp or a dict of region to timestamp, as regions are written one after another.
         """
-        current_time = datetime.utcnow()
-        if period == "day":
-            start_time = current_time - timedelta(days=1)
-        elif period == "week":
-            start_time = current_time - timedelta(weeks=1)
-        elif period == "month":
-            start_time = current_time - timedelta(days=30)
-        else:  # 'all' or any other value defaults to fetching all records
-            start_time = None
-
-        query = {}
-        if start_time:
-            query["timestamp"] = {"$gte": int(start_time.timestamp() * 1000)}
-
-        regions = ['us', 'eu', 'kr', 'tw']
         all_data = []
-        for region in regions:
-            region_collection_name = f"{collection_name}_{region}"
+        for region in REGIONS:
+            query = get_period_query(period, get_region_since(since, region))
+            region_collection_name = recipe_collection_name(collection_name, region, recipe)
             collection = self.db[region_collection_name]
-            documents = list(collection.find(query, {"_id": 0}))
-            all_data.append({"region": region, "data": documents})
+            cursor = collection.find(query, {"_id": 0})
+            if since is not None:
+                cursor = cursor.sort("timestamp", 1)
+            data = list(cursor)
+            if collection_name == "total_costs":
+                data = self.stitch_compacted_total_costs(region, recipe, query, data)
+            all_data.append({"region": region, "data": data})
 
         return all_data
 
-    def check_date_exists_in_daily_average(self, region, timestamp):
+    def stitch_compacted_total_costs(self, region, recipe, query, raw_documents):
+        """Prepends the hours matching the query from the region's compacted total cost buckets."""
+        bucket_collection = self.db[recipe_collection_name("total_costs_daily", region, recipe)]
+        buckets = list(bucket_collection.find(get_bucket_query(query), {"_id": 0}))
+        if not buckets:
+            return raw_documents
+        return stitch_total_costs(buckets, raw_documents, query)
+
+    def compact_total_costs(self, region, raw_days, recipe=DEFAULT_RECIPE):
+        """
+        Moves hourly total costs older than raw_days into per-day bucket documents, so the raw collection stays a constant size.
+        Returns the number of hourly documents compacted.
+        """
+        raw_collection = self.db[recipe_collection_name("total_costs", region, recipe)]
+        bucket_collection = self.db[recipe_collection_name("total_costs_daily", region, recipe)]
+        cursor = raw_collection.find({"timestamp": {"$lt": get_compaction_cutoff(raw_days)}}, {"_id": 0}).sort("timestamp", 1)
+        compacted = 0
+        for day_timestamp, documents in groupby(cursor, key=lambda document: get_day_timestamp(document['timestamp'])):
+            documents = list(documents)
+            compacted += len(documents)
+            # Samples imported after a day was compacted are merged into its existing bucket
+            existing = bucket_collection.find_one({"timestamp": day_timestamp})
+            if existing is not None:
+                documents = expand_day_bucket(existing) + documents
+            bucket_collection.replace_one({"timestamp": day_timestamp}, build_day_bucket(day_timestamp, documents), upsert=True)
+            # The raw hours are only removed once their bucket is written
+            raw_collection.delete_many({"timestamp": {"$gte": day_timestamp, "$lt": day_timestamp + DAY_MS}})
+        return compacted
+
+    def check_date_exists_in_daily_average(self, region, timestamp, recipe=DEFAULT_RECIPE):
         """Checks if a given date already exists in the daily_average_[region] collection."""
-        collection_name = f"daily_averages_{region}"
+        collection_name = recipe_collection_name("daily_averages", region, recipe)
         collection = self.db[collection_name]
         exists = collection.find_one({"timestamp": timestamp}) is not None
         return exists
 
-    def check_timestamp_exists_in_total_costs(self, region, timestamp):
+    def check_timestamp_exists_in_total_costs(self, region, timestamp, recipe=DEFAULT_RECIPE):
         """Checks if a given timestamp already exists in the total_costs_[region] collection."""
-        collection_name = f"total_costs_{region}"
+        collection_name = recipe_collection_name("total_costs", region, recipe)
         collection = self.db[collection_name]
         exists = collection.find_one({"timestamp": timestamp}) is not None
         return exists
 
-    def get_total_costs_from_previous_day(self, region, given_timestamp):
+    def get_total_costs_from_previous_day(self, region, given_timestamp, recipe=DEFAULT_RECIPE):
         """Fetches documents that have timestamps within the previous day of the given timestamp."""
         # Convert given_timestamp from milliseconds to a datetime object
         given_date = datetime.fromtimestamp(given_timestamp / 1000, pytz.utc)
@@ -147,7 +339,7 @@ class MongoDBManager:
         end_timestamp = int(end_of_previous_day.timestamp() * 1000)
 
         # Define collection name based on prefix and region
-        collection_name = f"total_costs_{region}"
+        collection_name = recipe_collection_name("total_costs", region, recipe)
         collection = self.db[collection_name]
 
         # Query for documents within the previous day
@@ -171,25 +363,36 @@ class MongoDBManager:
         """Appends total costs data to the specified region's file."""
         return self.save_region_data(collection_prefix, region, document)
 
-    def save_total_costs(self, region, document):
-        return self.save_region_data('total_costs', region, document)
+    def save_total_costs(self, region, document, recipe=DEFAULT_RECIPE):
+        return self.save_region_data('total_costs', region, document, recipe)
+
+    def save_daily_average(self, region, document, recipe=DEFAULT_RECIPE):
+        return self.save_region_data('daily_averages', region, document, recipe)
 
-    def save_daily_average(self, region, document):
-        return self.save_region_data('daily_averages', region, document)
+    def save_price_changes(self, region, document):
+        """Saves a sparse document of the item prices that changed since the previous sample."""
+        return self.save_region_data('price_changes', region, document)
 
-    def get_all_total_costs(self, period="all"):
+    def get_all_total_costs(self, period="all", recipe=DEFAULT_RECIPE, since=None):
         """
-        Fetches all total cost data within the specified time period.
+        Fetches all total cost data of a recipe within the specified time period.
         """
         collection_name = "total_costs"
-        return self.get_data_within_period(collection_name, period)
+        return self.get_data_within_period(collection_name, period, recipe, since)
     
-    def get_all_daily_averages(self, period="all"):
+    def get_all_daily_averages(self, period="all", recipe=DEFAULT_RECIPE, since=None):
         """
-        Fetches all daily average data within the specified time period.
+        Fetches all daily average data of a recipe within the specified time period.
         """
         collection_name = "daily_averages"
-        return self.get_data_within_period(collection_name, period)
+        return self.get_data_within_period(collection_name, period, recipe, since)
+
+    def ensure_timestamp_indexes(self, recipes):
+        """Creates the timestamp indexes the history and since queries rely on."""
+        for recipe in recipes:
+            for collection_prefix in ("total_costs", "total_costs_daily", "daily_averages"):
+                for region in REGIONS:
+                    self.db[recipe_collection_name(collection_prefix, region, recipe)].create_index("timestamp")
 
     def bulk_save_to_collection(self, collection_name, documents):
         """
@@ -197,4 +400,68 @@ class MongoDBManager:
         """
         collection = self.db[collection_name]
         result = collection.insert_many(documents)
-        return result.inserted_ids
\ No newline at end of file
+        return result.inserted_ids
+
+    def bulk_upsert_by_timestamp(self, collection_name, documents):
+        """
+        Upserts a list of JSON objects to the specified collection, keyed on their timestamp.
+        Running the same import twice replaces the existing documents instead of duplicating them.
+        """
+        collection = self.db[collection_name]
+        collection.create_index('timestamp')
+        operations = [ReplaceOne({'timestamp': document['timestamp']}, document, upsert=True) for document in documents]
+        if not operations:
+            return None
+        return collection.bulk_write(operations, ordered=False)
+
+    def acquire_job_lock(self, name, owner, lock_timeout):
+        """
+        Acquires the named job lock for the owner if it is free, expired or already held by the owner.
+        Returns True if the lock was acquired.
+        """
+        now = datetime.utcnow()
+        try:
+            self.db['job_locks'].find_one_and_update(
+                {'_id': name, '$or': [{'expires_at': {'$lt': now}}, {'owner': owner}]},
+                {'$set': {'owner': owner, 'acquired_at': now, 'expires_at': now + lock_timeout}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def renew_job_lock(self, name, owner, lock_timeout):
+        """Extends the named job lock held by the owner, returns False if the owner no longer holds it."""
+        result = self.db['job_locks'].update_one({'_id': name, 'owner': owner}, {'$set': {'expires_at': datetime.utcnow() + lock_timeout}})
+        return result.matched_count == 1
+
+    def release_job_lock(self, name, owner):
+        """Releases the named job lock if it is held by the owner."""
+        self.db['job_locks'].delete_one({'_id': name, 'owner': owner})
+
+    def ensure_job_run_indexes(self, retention_days):
+        """
+        Creates the index the last run lookups sort on and a TTL index that removes runs older than retention_days,
+        a job sampling every few minutes would otherwise grow 'job_runs' forever.
+        """
+        collection = self.db['job_runs']
+        collection.create_index([('name', ASCENDING), ('started_at', DESCENDING)])
+        expire_after_seconds = int(retention_days * 24 * 60 * 60)
+        try:
+            collection.create_index('started_at', expireAfterSeconds=expire_after_seconds)
+        except OperationFailure:
+            # The TTL index exists with a different retention, which can only be changed in place
+            self.db.command('collMod', 'job_runs', index={'keyPattern': {'started_at': 1}, 'expireAfterSeconds': expire_after_seconds})
+
+    def save_job_run(self, document):
+        """Saves the outcome and metrics of a single job run."""
+        result = self.db['job_runs'].insert_one(document)
+        return result.inserted_id
+
+    def get_last_successful_job_run(self, name):
+        """Retrieves the latest successful run of the named job."""
+        return self.db['job_runs'].find_one({'name': name, 'success': True}, sort=[('started_at', DESCENDING)])
+
+    def get_last_job_run(self, name):
+        """Retrieves the latest run of the named job, successful or not."""
+        return self.db['job_runs'].find_one({'name': name}, sort=[('started_at', DESCENDING)])
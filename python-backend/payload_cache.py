@@ -0,0 +1,171 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import traceback
+import instrumentation
+
+class PayloadCache:
+    """
+    In-process stale-while-revalidate cache for API payloads.
+    A missing key is built once while concurrent callers wait for the same result, an expired key keeps
+    being served while a single background task rebuilds it. Entries are evicted least recently used first
+    once either the entry or the byte limit is exceeded.
+    """
+    def __init__(self, ttl=300, max_entries=128, max_bytes=64 * 1024 * 1024, refresh_workers=2):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        # The future of every running background rebuild by key
+        self.refreshing = {}
+        self.executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='payload-refresh')
+
+    def get_key_lock(self, key):
+        with self.lock:
+            if key not in self.key_locks:
+                self.key_locks[key] = threading.Lock()
+            return self.key_locks[key]
+
+    def lookup(self, key):
+        """Returns the entry of the key as (value, expires_at) or None, marking it as recently used."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value):
+        size = len(value) if isinstance(value, (str, bytes)) else 0
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries[key][2]
+            self.entries[key] = (value, time.monotonic() + self.ttl, size)
+            self.entries.move_to_end(key)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or (self.total_bytes > self.max_bytes and len(self.entries) > 1):
+                evicted_key, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.key_locks.pop(evicted_key, None)
+
+    def get(self, key, builder):
+        """Returns the cached payload of the key, building it with builder() on a miss."""
+        entry = self.lookup(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if time.monotonic() >= expires_at:
+                instrumentation.record_cache_lookup(key, 'stale')
+                self.refresh(key, builder)
+            else:
+                instrumentation.record_cache_lookup(key, 'hit')
+            return value
+
+        instrumentation.record_cache_lookup(key, 'miss')
+        # Only one caller builds a missing key, the others wait and read its result
+        with self.get_key_lock(key):
+            entry = self.lookup(key)
+            if entry is not None:
+                return entry[0]
+            value = builder()
+            self.set(key, value)
+            return value
+
+    def refresh(self, key, builder):
+        """
+        Rebuilds the key in the background unless a rebuild is already running, the old value is served until then.
+        Returns the future of the running rebuild.
+        """
+        with self.lock:
+            # Submitted under the lock, so the rebuild cannot finish and discard its key before it is registered
+            if key not in self.refreshing:
+                self.refreshing[key] = self.executor.submit(self.rebuild, key, builder)
+            return self.refreshing[key]
+
+    def wait_for_refresh(self, key):
+        """Blocks until a running background rebuild of the key finished."""
+        with self.lock:
+            future = self.refreshing.get(key)
+        if future is not None:
+            future.result()
+
+    def rebuild(self, key, builder):
+        try:
+            with self.get_key_lock(key):
+                self.set(key, builder())
+        except Exception as e:
+            print(f"Error refreshing cached payload {key}: {e}")
+            traceback.print_exc()
+        finally:
+            with self.lock:
+                self.refreshing.pop(key, None)
+
+    def invalidate(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[2]
+
+class AsyncPayloadCache:
+    """
+    asyncio version of PayloadCache with the same stale-while-revalidate behaviour and entry and byte limits,
+    builders are coroutines.
+    """
+    def __init__(self, ttl=300, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.key_locks = {}
+        self.refreshing = {}
+
+    def set(self, key, value):
+        size = len(value) if isinstance(value, (str, bytes)) else 0
+        if key in self.entries:
+            self.total_bytes -= self.entries[key][2]
+        self.entries[key] = (value, time.monotonic() + self.ttl, size)
+        self.entries.move_to_end(key)
+        self.total_bytes += size
+        while len(self.entries) > self.max_entries or (self.total_bytes > self.max_bytes and len(self.entries) > 1):
+            evicted_key, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.key_locks.pop(evicted_key, None)
+
+    async def get(self, key, builder):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            value, expires_at, _ = entry
+            if time.monotonic() >= expires_at:
+                instrumentation.record_cache_lookup(key, 'stale')
+                self.refresh(key, builder)
+            else:
+                instrumentation.record_cache_lookup(key, 'hit')
+            return value
+
+        instrumentation.record_cache_lookup(key, 'miss')
+        lock = self.key_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0]
+            value = await builder()
+            self.set(key, value)
+            return value
+
+    def refresh(self, key, builder):
+        if key in self.refreshing:
+            return
+        self.refreshing[key] = asyncio.ensure_future(self.rebuild(key, builder))
+
+    async def rebuild(self, key, builder):
+        try:
+            self.set(key, await builder())
+        except Exception as e:
+            print(f"Error refreshing cached payload {key}: {e}")
+        finally:
+            self.refreshing.pop(key, None)
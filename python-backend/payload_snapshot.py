@@ -0,0 +1,52 @@
+import gzip
+import json
+import os
+import time
+from file_utils import write_atomic
+
+SNAPSHOT_FORMAT = 2
+
+class PayloadSnapshot:
+    """
+    Gzipped file of the materialized API payloads, so a restarted API can serve its first requests from memory.
+    Every payload is saved with the data version it was built from and is only loaded while the DB still has that version.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, topic_payloads):
+        """Writes the payloads, a dict of topic to {cache key: (data version, payload)}."""
+        document = {
+            'format': SNAPSHOT_FORMAT,
+            'saved_at': int(time.time() * 1000),
+            'topics': {topic: {cache_key: {'version': version, 'payload': payload} for cache_key, (version, payload) in payloads.items()}
+                       for topic, payloads in topic_payloads.items()}
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        write_atomic(self.path, gzip.compress(json.dumps(document).encode('utf-8'), compresslevel=6))
+
+    def load(self, versions):
+        """
+        Returns the (data version, payload) of every cache key whose saved version matches its topic's current one,
+        and the topics that are missing from the snapshot or have an outdated payload.
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                document = json.loads(gzip.decompress(file.read()))
+        except FileNotFoundError:
+            return {}, set(versions)
+        except Exception as e:
+            print(f"Error loading payload snapshot {self.path}: {e}")
+            return {}, set(versions)
+        if document.get('format') != SNAPSHOT_FORMAT:
+            return {}, set(versions)
+
+        payloads = {}
+        outdated_topics = set(versions)
+        for topic, entries in document['topics'].items():
+            current = {cache_key: (entry['version'], entry['payload']) for cache_key, entry in entries.items()
+                       if entry['version'] is not None and entry['version'] == versions.get(topic)}
+            payloads.update(current)
+            if entries and len(current) == len(entries):
+                outdated_topics.discard(topic)
+        return payloads, outdated_topics
@@ -0,0 +1,185 @@
+import bisect
+import math
+import numpy as np
+from item_catalog import catalog
+
+# Scales the MAD to the standard deviation of normally distributed prices
+MAD_SCALE = 1.4826
+
+def to_list(values):
+    """Converts an array to a BSON and JSON friendly list, missing values become None."""
+    return [None if np.isnan(value) else round(float(value), 2) for value in values.tolist()]
+
+def from_list(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+def get_sorted_median(values):
+    """Returns the median of a sorted list, NaN if it is empty."""
+    count = len(values)
+    if count == 0:
+        return np.nan
+    middle = count // 2
+    return values[middle] if count % 2 else (values[middle - 1] + values[middle]) / 2
+
+def get_kth_distance(values, median, k):
+    """
+    Returns the k-th smallest distance of a sorted list's values to its median in logarithmic time.
+    The distances below and above the median are two sorted sequences, the k-th smallest of both is found by bisecting
+    how many of the k + 1 smallest distances come from the values below.
+    """
+    split = bisect.bisect_left(values, median)
+    below_count, above_count = split, len(values) - split
+    below = lambda index: median - values[split - 1 - index]
+    above = lambda index: values[split + index] - median
+    taken = k + 1
+    low, high = max(0, taken - above_count), min(taken, below_count)
+    while True:
+        from_below = (low + high) // 2
+        from_above = taken - from_below
+        if from_below < below_count and from_above > 0 and above(from_above - 1) > below(from_below):
+            low = from_below + 1
+        elif from_below > 0 and from_above < above_count and below(from_below - 1) > above(from_above):
+            high = from_below - 1
+        else:
+            return max(below(from_below - 1) if from_below > 0 else -math.inf, above(from_above - 1) if from_above > 0 else -math.inf)
+
+def get_sorted_mad(values, median):
+    """Returns the median absolute deviation of a sorted list from its median, NaN if it is empty."""
+    count = len(values)
+    if count == 0:
+        return np.nan
+    if count % 2:
+        return get_kth_distance(values, median, count // 2)
+    return (get_kth_distance(values, median, count // 2 - 1) + get_kth_distance(values, median, count // 2)) / 2
+
+class RollingPriceStatistics:
+    """
+    Keeps rolling statistics of every catalog item's lowest price per region.
+    Each hour contributes one sample: the EWMA is updated in place and the median/MAD cover a fixed window of hours.
+    Every item also keeps its window sorted, so an hour costs one removal and one insertion per item and the median
+    and MAD are read from the sorted window without rescanning it. Samples far outside median ± threshold * MAD are winsorized.
+    """
+    def __init__(self, window_hours=48, alpha=0.1, threshold=5.0, min_samples=12, min_spread=0.05):
+        self.window_hours = window_hours
+        self.alpha = alpha
+        self.threshold = threshold
+        # Outliers are only detected once an item has enough hours to trust its median
+        self.min_samples = min_samples
+        # Lower bound of the spread as a fraction of the median, items with flat prices would otherwise flag every change
+        self.min_spread = min_spread
+        self.regions = {}
+
+    def new_region_state(self):
+        item_count = len(catalog.items)
+        return {
+            'timestamp': None,
+            'pending': np.full(item_count, np.nan),
+            'window': np.full((item_count, self.window_hours), np.nan),
+            # The samples of every item's window in ascending order, without missing hours
+            'sorted_window': [[] for _ in range(item_count)],
+            'position': 0,
+            'ewma': np.full(item_count, np.nan),
+            'median': np.full(item_count, np.nan),
+            'mad': np.full(item_count, np.nan),
+            'samples': np.zeros(item_count, dtype=np.int64),
+            'outliers': np.zeros(item_count, dtype=bool)
+        }
+
+    def get_bounds(self, state):
+        """Returns the lower and upper price bounds of every item and whether the item has enough samples to apply them."""
+        spread = self.threshold * np.fmax(MAD_SCALE * state['mad'], self.min_spread * state['median'])
+        return state['median'] - spread, state['median'] + spread, state['samples'] >= self.min_samples
+
+    def update_window_statistics(self, state):
+        """Reads the sample count, median and MAD of every item from its sorted window."""
+        sorted_window = state['sorted_window']
+        state['samples'] = np.array([len(values) for values in sorted_window], dtype=np.int64)
+        state['median'] = np.array([get_sorted_median(values) for values in sorted_window], dtype=float)
+        state['mad'] = np.array([get_sorted_mad(values, median) for values, median in zip(sorted_window, state['median'].tolist())], dtype=float)
+
+    def commit(self, state):
+        """Moves the last sample of the finished hour into the window and updates the statistics."""
+        pending = state['pending']
+        lower, upper, ready = self.get_bounds(state)
+        winsorized = np.where(ready, np.clip(pending, lower, upper), pending)
+
+        # The raw sample enters the window so a lasting price change becomes the new median
+        leaving = state['window'][:, state['position']].tolist()
+        state['window'][:, state['position']] = pending
+        for values, old, new in zip(state['sorted_window'], leaving, pending.tolist()):
+            if not math.isnan(old):
+                del values[bisect.bisect_left(values, old)]
+            if not math.isnan(new):
+                bisect.insort(values, new)
+        state['position'] = (state['position'] + 1) % self.window_hours
+        self.update_window_statistics(state)
+
+        ewma = state['ewma']
+        state['ewma'] = np.where(np.isnan(winsorized), ewma,
+                                 np.where(np.isnan(ewma), winsorized, self.alpha * winsorized + (1 - self.alpha) * ewma))
+
+    def filter_prices(self, region, timestamp, prices, found):
+        """
+        Checks a sample of the region's lowest prices against the statistics of the previous hours.
+        Returns the prices with outliers winsorized to the nearest bound and the mask of outliers.
+        """
+        state = self.regions.setdefault(region, self.new_region_state())
+        if state['timestamp'] is not None and timestamp > state['timestamp']:
+            self.commit(state)
+        state['timestamp'] = timestamp
+        state['pending'] = np.where(found, prices, np.nan)
+
+        lower, upper, ready = self.get_bounds(state)
+        outliers = found & ready & ((prices < lower) | (prices > upper))
+        filtered = prices.copy()
+        filtered[outliers] = np.rint(np.clip(prices[outliers], lower[outliers], upper[outliers])).astype(np.int64)
+        state['outliers'] = outliers
+        return filtered, outliers
+
+    def get_summary(self, region):
+        """Returns the current statistics of every item in the region."""
+        state = self.regions[region]
+        return [{
+            'id': item['id'],
+            'name': item['name'],
+            'ewma': ewma,
+            'median': median,
+            'mad': mad,
+            'samples': samples,
+            'outlier': outlier
+        } for item, ewma, median, mad, samples, outlier in zip(
+            catalog.items, to_list(state['ewma']), to_list(state['median']), to_list(state['mad']),
+            state['samples'].tolist(), state['outliers'].tolist())]
+
+    def to_document(self, region):
+        """Serializes the region's summary and the state needed to resume after a restart."""
+        state = self.regions[region]
+        return {
+            'region': region,
+            'timestamp': state['timestamp'],
+            'items': self.get_summary(region),
+            'state': {
+                'item_ids': [item['id'] for item in catalog.items],
+                'pending': to_list(state['pending']),
+                'window': [to_list(row) for row in state['window']],
+                'position': state['position'],
+                'ewma': to_list(state['ewma'])
+            }
+        }
+
+    def load_document(self, document):
+        """Restores a region from a saved document, skipped if the catalog or window size changed since it was saved."""
+        saved = document.get('state')
+        if saved is None or saved['item_ids'] != [item['id'] for item in catalog.items] or len(saved['window'][0]) != self.window_hours:
+            return False
+
+        state = self.new_region_state()
+        state['timestamp'] = document['timestamp']
+        state['pending'] = from_list(saved['pending'])
+        state['window'] = np.array([from_list(row) for row in saved['window']])
+        state['position'] = saved['position']
+        state['ewma'] = from_list(saved['ewma'])
+        state['sorted_window'] = [sorted(value for value in row.tolist() if not math.isnan(value)) for row in state['window']]
+        self.update_window_statistics(state)
+        self.regions[document['region']] = state
+        return True
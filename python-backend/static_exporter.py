@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from file_utils import write_atomic
+from item_catalog import DEFAULT_RECIPE
+
+def get_static_export_name(cache_key):
+    """Maps an API payload cache key to the static file name, e.g. history_data_all_fyralath to history_all."""
+    name = cache_key.replace('current_data', 'current').replace('history_data', 'history').replace('acquisition_data', 'acquisitions')
+    return name.removesuffix(f'_{DEFAULT_RECIPE}')
+
+class StaticExporter:
+    """
+    Writes API payloads as content-hashed, pre-compressed static JSON files with a manifest,
+    so they can be served from a CDN or GitHub Pages with the API only as a fallback.
+    Hashed files never change and can be cached forever, only manifest.json and the
+    unversioned <name>.json and <name>.json.gz aliases are replaced when their payload changes.
+    """
+    def __init__(self, output_dir, keep_versions=5):
+        self.output_dir = output_dir
+        self.keep_versions = keep_versions
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest_path = os.path.join(output_dir, 'manifest.json')
+        # The price and acquisition jobs export from different threads and share the manifest
+        self.lock = threading.Lock()
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'files': {}}
+
+    def export_payload(self, name, payload, previous_entry):
+        content = payload.encode('utf-8')
+        content_hash = hashlib.sha256(content).hexdigest()[:16]
+        file_name = f"{name}.{content_hash}.json"
+        path = os.path.join(self.output_dir, file_name)
+        alias_path = os.path.join(self.output_dir, f"{name}.json")
+        unchanged = (previous_entry or {}).get('hash') == content_hash and all(
+            os.path.exists(existing_path) for existing_path in (path, f"{path}.gz", alias_path, f"{alias_path}.gz"))
+        if not unchanged:
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if not os.path.exists(path):
+                write_atomic(path, content)
+                write_atomic(f"{path}.gz", compressed)
+            write_atomic(alias_path, content)
+            write_atomic(f"{alias_path}.gz", compressed)
+
+        versions = [file_name] + [version for version in (previous_entry or {}).get('versions', []) if version != file_name]
+        for old_version in versions[self.keep_versions:]:
+            for old_path in (os.path.join(self.output_dir, old_version), os.path.join(self.output_dir, f"{old_version}.gz")):
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+        return {
+            'file': file_name,
+            'gzip_file': f"{file_name}.gz",
+            'hash': content_hash,
+            'size': len(content),
+            'versions': versions[:self.keep_versions]
+        }
+
+    def export(self, payloads):
+        """Exports the payloads by name and updates the manifest, payloads not given keep their previous entry."""
+        with self.lock:
+            manifest = self.read_manifest()
+            for name, payload in payloads.items():
+                manifest['files'][name] = self.export_payload(name, payload, manifest['files'].get(name))
+            manifest['generated_at'] = int(time.time() * 1000)
+            write_atomic(self.manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+        print(f"Exported {len(payloads)} static payloads to {self.output_dir}")
+        return manifest
@@ -0,0 +1,77 @@
+from collections import Counter
+import pytest
+import mongodb_manager
+from acquisition_cube import AcquisitionCube, parse_cube_query
+from acquisition_data_aggregator import AcquisitionDataAggregator
+
+def build_cube():
+    cube = AcquisitionCube()
+    cube.add('us', 'paladin', 0, 2, 0)
+    cube.add('us', 'paladin', 3, 2, 1)
+    cube.add('eu', 'paladin', 3, 4, 1)
+    cube.add('eu', 'warrior', 5, 4, 0)
+    cube.add('eu', 'warrior', 5, 4, 0)
+    return cube
+
+def test_query_filters_and_rolls_up():
+    cube = build_cube()
+
+    assert cube.query() == [{'count': 5}]
+    assert cube.query(group_by=['region']) == [{'region': 'eu', 'count': 3}, {'region': 'us', 'count': 2}]
+    assert cube.query({'class': ['paladin'], 'week': [3, 5]}, ['region', 'kills_hc']) == [
+        {'region': 'eu', 'kills_hc': 4, 'count': 1},
+        {'region': 'us', 'kills_hc': 2, 'count': 1}
+    ]
+    assert cube.query({'region': ['kr']}) == []
+
+def test_query_rejects_unknown_dimensions():
+    cube = build_cube()
+
+    with pytest.raises(ValueError):
+        cube.query(group_by=['realm'])
+    with pytest.raises(ValueError):
+        cube.query({'realm': ['argent-dawn']})
+
+def test_parse_cube_query():
+    filters, group_by = parse_cube_query({'group_by': 'class,week', 'region': 'us,eu', 'kills_m': '0,1'})
+
+    assert group_by == ['class', 'week']
+    assert filters == {'region': ['us', 'eu'], 'kills_m': [0, 1]}
+    for args in ({'week': 'three'}, {'kills_hc': '1,x'}, {'kills_m': '-1'}, {'group_by': 'realm'}):
+        with pytest.raises(ValueError):
+            parse_cube_query(args)
+
+def test_document_round_trip():
+    cube = build_cube()
+
+    restored = AcquisitionCube.from_document(cube.to_document())
+
+    assert restored.cells == cube.cells
+    assert AcquisitionCube.from_document(None).query() == []
+
+def test_rollups_match_the_summary_histograms(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    from benchmarks import fixtures
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_manager, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setenv('MONGODB_DB_NAME', 'test')
+    mongodb_manager.close_clients()
+    db = mongodb_manager.MongoDBManager(workload='ingest').db
+    for collection_name, documents in fixtures.generate_characters(600).items():
+        db[collection_name].insert_many(documents)
+
+    AcquisitionDataAggregator().aggregate_data()
+
+    summary = db['acquisitions_summary'].find_one()
+    cube = AcquisitionCube.from_document(db['acquisitions_cube'].find_one())
+    for row in cube.query(group_by=['class', 'week']):
+        summary[row['class']]['true' if row['week'] else 'false'] -= row['count']
+    assert all(summary[class_name] == {'true': 0, 'false': 0} for class_name in ('death-knight', 'paladin', 'warrior'))
+    for difficulty in ('hc', 'm'):
+        with_weapon, without_weapon = Counter(), Counter()
+        for row in cube.query(group_by=['week', f'kills_{difficulty}']):
+            (with_weapon if row['week'] else without_weapon)[str(row[f'kills_{difficulty}'])] += row['count']
+        histograms = summary['kills_summary']
+        assert with_weapon == Counter({kills: count for kills, count in histograms[f'chars_with_weapon_{difficulty}'].items() if count})
+        assert without_weapon == Counter({kills: count for kills, count in histograms[f'chars_without_weapon_{difficulty}'].items() if count})
+    mongodb_manager.close_clients()
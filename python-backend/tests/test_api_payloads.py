@@ -0,0 +1,47 @@
+import json
+from api_payloads import diff_current_payloads, format_current_payload
+
+def region(name, prices, ratio=1.0):
+    return {'region': name, 'wow_token_ratio': ratio, 'items': [{'id': item_id, 'name': str(item_id), 'price': price} for item_id, price in prices.items()]}
+
+def test_diff_sends_changed_added_and_removed_items():
+    previous = {'timestamp': 1, 'data': [region('us', {1: 10, 2: 20, 3: 30})]}
+    latest = {'timestamp': 2, 'data': [region('us', {1: 10, 2: 25, 4: 40}, ratio=2.0)]}
+
+    diff = diff_current_payloads(previous, latest)
+
+    changes = diff['regions']['us']
+    assert changes['items'] == {'2': 25}
+    assert changes['added_items'] == [{'id': 4, 'name': '4', 'price': 40}]
+    assert changes['removed_items'] == [3]
+    assert changes['wow_token_ratio'] == 2.0
+    assert diff['removed_regions'] == []
+
+def test_diff_sends_added_regions_whole_and_removed_regions_by_name():
+    previous = {'timestamp': 1, 'data': [region('us', {1: 10}), region('eu', {1: 12})]}
+    latest = {'timestamp': 2, 'data': [region('us', {1: 10}), region('kr', {1: 9})]}
+
+    diff = diff_current_payloads(previous, latest)
+
+    assert diff['regions'] == {'kr': {'region': latest['data'][1]}}
+    assert diff['removed_regions'] == ['eu']
+
+def test_diff_against_no_previous_payload_adds_every_region():
+    latest = {'timestamp': 2, 'data': [region('us', {1: 10})]}
+
+    diff = diff_current_payloads(None, latest)
+
+    assert diff['regions'] == {'us': {'region': latest['data'][0]}}
+    assert diff['removed_regions'] == []
+
+def test_current_payload_serves_the_recipe_as_data():
+    latest = {'_id': 'current', 'snapshot_id': 's1', 'timestamp': 2, 'sampled_at': 3,
+              'recipes': {'fyralath': [region('us', {1: 10})], 'other': [region('us', {2: 20})]}}
+
+    assert json.loads(format_current_payload(latest, 'other')) == {'_id': 's1', 'timestamp': 2, 'sampled_at': 3, 'data': [region('us', {2: 20})]}
+    assert 'data' not in latest
+
+def test_current_payload_of_a_document_without_recipes():
+    latest = {'_id': 'old', 'timestamp': 1, 'data': [region('us', {1: 10})]}
+
+    assert json.loads(format_current_payload(latest, 'fyralath'))['data'] == [region('us', {1: 10})]
@@ -0,0 +1,103 @@
+import time
+import requests
+import pytest
+import auction_data_sampler
+from auction_data_sampler import AuctionDataSampler, FETCH_FAILED, FETCH_MODIFIED, FETCH_NOT_MODIFIED
+from item_catalog import catalog, DEFAULT_RECIPE
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def json(self):
+        return self.body
+
+@pytest.fixture
+def sampler(monkeypatch):
+    sampler = AuctionDataSampler()
+    sampler.regions = ['us', 'eu']
+    sampler.token_requests = []
+
+    def request_access_token(client_id, client_secret):
+        sampler.token_requests.append(client_id)
+        return {'access_token': f'token-{len(sampler.token_requests)}', 'expires_in': 86399}
+
+    monkeypatch.setattr(sampler, 'request_access_token', request_access_token)
+    monkeypatch.setattr(AuctionDataSampler, 'fetch_wow_token', lambda self, region, access_token: {'price': 3000000000})
+    return sampler
+
+def serve(monkeypatch, responses):
+    """Answers every region's dump request with the response, or raises the exception, given for the region."""
+    def get(url, **kwargs):
+        response = responses[url.split('//')[1].split('.')[0]]
+        if isinstance(response, Exception):
+            raise response
+        return response
+    monkeypatch.setattr(auction_data_sampler.upstream_http, 'get', get)
+
+def dump(price):
+    return FakeResponse(200, {'auctions': [{'item': {'id': item['id']}, 'unit_price': price} for item in catalog.items]})
+
+def test_fetch_reports_failures_separately_from_unchanged_dumps(sampler, monkeypatch):
+    serve(monkeypatch, {'us': FakeResponse(304), 'eu': requests.ConnectionError("timed out")})
+
+    assert sampler.fetch_data_if_modified('us', 'token') == (None, FETCH_NOT_MODIFIED)
+    assert sampler.fetch_data_if_modified('eu', 'token') == (None, FETCH_FAILED)
+
+    serve(monkeypatch, {'us': FakeResponse(503), 'eu': dump(100)})
+    assert sampler.fetch_data_if_modified('us', 'token') == (None, FETCH_FAILED)
+    assert sampler.fetch_data_if_modified('eu', 'token')[1] == FETCH_MODIFIED
+
+def get_regions(result):
+    return [entry['region'] for entry in result['recipes'][DEFAULT_RECIPE]]
+
+def test_failing_region_is_left_out_once_stale(sampler, monkeypatch):
+    serve(monkeypatch, {'us': dump(100), 'eu': dump(200)})
+    assert get_regions(sampler.run()) == ['us', 'eu']
+
+    # A single failed fetch keeps the region's recent prices
+    serve(monkeypatch, {'us': dump(110), 'eu': requests.ConnectionError("timed out")})
+    assert get_regions(sampler.run()) == ['us', 'eu']
+
+    # Once the last confirmed prices are older than the threshold the region is no longer reported
+    sampler.confirmed_at['eu'] -= sampler.stale_seconds + 1
+    serve(monkeypatch, {'us': dump(120), 'eu': requests.ConnectionError("timed out")})
+    assert get_regions(sampler.run()) == ['us']
+
+def test_unchanged_dump_keeps_region_current(sampler, monkeypatch):
+    serve(monkeypatch, {'us': dump(100), 'eu': dump(200)})
+    sampler.run()
+
+    sampler.confirmed_at['eu'] -= sampler.stale_seconds + 1
+    sampler.last_hour_timestamp = None
+    serve(monkeypatch, {'us': dump(110), 'eu': FakeResponse(304)})
+    assert get_regions(sampler.run()) == ['us', 'eu']
+
+def test_access_token_is_reused_until_it_is_about_to_expire(sampler, monkeypatch):
+    serve(monkeypatch, {'us': FakeResponse(304), 'eu': FakeResponse(304)})
+    for _ in range(3):
+        sampler.run()
+    assert len(sampler.token_requests) == 1
+
+    sampler.access_token_expires_at = time.time() + auction_data_sampler.TOKEN_RENEWAL_MARGIN - 1
+    sampler.run()
+    assert len(sampler.token_requests) == 2
+
+def test_rejected_access_token_is_renewed_and_the_fetch_retried(sampler, monkeypatch):
+    tokens = []
+
+    def get(url, params=None, **kwargs):
+        tokens.append(params['access_token'])
+        return FakeResponse(401) if params['access_token'] == 'token-1' else dump(100)
+
+    monkeypatch.setattr(auction_data_sampler.upstream_http, 'get', get)
+
+    assert get_regions(sampler.run()) == ['us', 'eu']
+    assert tokens == ['token-1', 'token-2', 'token-2']
+    assert len(sampler.token_requests) == 2
@@ -0,0 +1,70 @@
+import sys
+import threading
+import types
+from mongodb_manager import DATA_TOPICS
+from data_update_notifier import FileDataUpdateNotifier, RedisDataUpdateNotifier
+
+class FakePubSub:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def subscribe(self, channel):
+        if self.connection == 1:
+            raise ConnectionError("connection refused")
+
+    def listen(self):
+        if self.connection == 0:
+            yield {'data': b'prices'}
+            raise ConnectionError("connection reset")
+        yield {'data': b'acquisitions'}
+        threading.Event().wait()
+
+    def close(self):
+        pass
+
+class FakeRedis:
+    def __init__(self):
+        self.connections = 0
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        self.connections += 1
+        return FakePubSub(self.connections - 1)
+
+def wait_for(condition):
+    event = threading.Event()
+    for _ in range(200):
+        if condition():
+            return True
+        event.wait(0.01)
+    return False
+
+def test_redis_listener_reconnects_and_refreshes_every_topic(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setitem(sys.modules, 'redis', types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=lambda url: fake_redis)))
+    notifier = RedisDataUpdateNotifier('redis://localhost', reconnect_delay=0.01)
+    topics = []
+
+    def callback(topic):
+        topics.append(topic)
+        # A failing listener must not end the subscription either
+        raise RuntimeError("refresh failed")
+
+    notifier.listen(callback)
+
+    assert wait_for(lambda: 'acquisitions' in topics)
+    assert topics == ['prices', *DATA_TOPICS, 'acquisitions']
+    assert fake_redis.connections == 3
+
+def test_file_listener_survives_a_failing_callback(tmp_path):
+    notifier = FileDataUpdateNotifier(str(tmp_path), poll_interval=0.01)
+    topics = []
+
+    def callback(topic):
+        topics.append(topic)
+        raise RuntimeError("refresh failed")
+
+    notifier.listen(callback)
+    notifier.publish('prices')
+    assert wait_for(lambda: topics == ['prices'])
+    notifier.publish('acquisitions')
+    assert wait_for(lambda: topics == ['prices', 'acquisitions'])
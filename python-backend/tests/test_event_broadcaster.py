@@ -0,0 +1,45 @@
+import asyncio
+from event_broadcaster import CLOSED, EventBroadcaster
+
+def drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+def test_slow_subscriber_is_resynced_with_a_snapshot():
+    async def run():
+        broadcaster = EventBroadcaster(queue_size=2)
+        fast, slow = broadcaster.subscribe(), broadcaster.subscribe()
+        snapshots = []
+
+        def resync():
+            snapshots.append('snapshot')
+            return f'snapshot {len(snapshots)}'
+
+        broadcaster.publish('diff 0', resync=resync)
+        broadcaster.publish('diff 1', resync=resync)
+        assert drain(fast) == ['diff 0', 'diff 1']
+
+        # The slow subscriber's queue is full, so it gets the snapshot instead of losing a diff
+        broadcaster.publish('diff 2', resync=resync)
+        assert drain(fast) == ['diff 2']
+        assert drain(slow) == ['snapshot 1']
+
+        broadcaster.publish('diff 3', resync=resync)
+        assert drain(slow) == ['diff 3']
+        assert snapshots == ['snapshot']
+
+    asyncio.run(run())
+
+def test_slow_subscriber_without_resync_is_closed():
+    async def run():
+        broadcaster = EventBroadcaster(queue_size=1)
+        slow = broadcaster.subscribe()
+        broadcaster.publish('diff 0')
+        broadcaster.publish('diff 1')
+
+        assert drain(slow) == [CLOSED]
+        assert len(broadcaster) == 0
+
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+import exchange_data_parser
+from exchange_data_parser import ExchangeDataParser
+from item_catalog import catalog, FYRALATH_ID
+from mongodb_manager import MongoDBManager
+
+DAY = 24 * 60 * 60
+FIRST_DAY = int(datetime(2024, 1, 1).timestamp())
+
+class FakeCollection:
+    """Applies upserting ReplaceOne operations keyed on timestamp, the installed mongomock can not run them in bulk_write."""
+    def __init__(self):
+        self.documents = {}
+        self.operations = []
+
+    def create_index(self, key):
+        pass
+
+    def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+        for operation in operations:
+            assert operation._upsert and list(operation._filter) == ['timestamp']
+            self.documents[operation._filter['timestamp']] = dict(operation._doc)
+
+class FakeDBManager:
+    bulk_upsert_by_timestamp = MongoDBManager.bulk_upsert_by_timestamp
+
+    def __init__(self, db):
+        self.db = db
+
+def build_items_data(days, missing_day):
+    """Snapshots of every catalog item for each day, one item has no price on missing_day."""
+    return [{
+        'id': item['id'],
+        'snapshots': [{'timestamp': FIRST_DAY + day * DAY, 'price': 100 * (index + 1) + day}
+                      for day in range(days) if not (index == 0 and day == missing_day)]
+    } for index, item in enumerate(catalog.items)]
+
+def test_reimport_keeps_one_document_per_day(monkeypatch):
+    collections = defaultdict(FakeCollection)
+    monkeypatch.setattr(exchange_data_parser, 'MongoDBManager', lambda workload=None: FakeDBManager(collections))
+    parser = ExchangeDataParser()
+    data = {'eu': build_items_data(days=4, missing_day=2)}
+
+    parser.aggregate_and_save(data)
+    parser.aggregate_and_save(data)
+
+    collection = collections['daily_averages_eu']
+    assert len(collection.operations) == 6
+    # The day missing an item is dropped, every other day is stored once
+    assert sorted(collection.documents) == [FIRST_DAY, FIRST_DAY + DAY, FIRST_DAY + 3 * DAY]
+    for timestamp, document in collection.documents.items():
+        total, *items = document['items']
+        assert total['id'] == FYRALATH_ID
+        prices = np.array([item['price'] for item in items])
+        assert [item['id'] for item in items] == [item['id'] for item in catalog.items]
+        assert total['price'] == int(catalog.requirements_vector() @ prices)
@@ -0,0 +1,12 @@
+import os
+from file_utils import write_atomic
+
+def test_write_atomic_replaces_the_file_without_leaving_temporary_files(tmp_path):
+    path = str(tmp_path / 'data.json')
+    write_atomic(path, b'old')
+
+    write_atomic(path, b'new')
+
+    with open(path, 'rb') as file:
+        assert file.read() == b'new'
+    assert os.listdir(tmp_path) == ['data.json']
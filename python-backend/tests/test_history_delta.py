@@ -0,0 +1,49 @@
+import json
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+import mongodb_manager
+from api_payloads import format_history_delta_payload, parse_history_cursor
+
+HOUR = 60 * 60 * 1000
+
+@pytest.fixture
+def db_manager(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_manager, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setenv('MONGODB_DB_NAME', 'test')
+    mongodb_manager.close_clients()
+    yield mongodb_manager.MongoDBManager()
+    mongodb_manager.close_clients()
+
+def save_hour(db_manager, region, timestamp):
+    db_manager.save_total_costs(region, {'timestamp': timestamp, 'items': [{'name': 'Fyr', 'id': 1, 'price': timestamp}]})
+
+def sync(db_manager, since):
+    since = parse_history_cursor(str(since))
+    return json.loads(format_history_delta_payload(db_manager.get_all_total_costs('all', since=since), since))
+
+def test_partially_written_hour_is_synced_once_complete(db_manager):
+    hour = 1_700_000_000_000 - 1_700_000_000_000 % HOUR
+    for region in mongodb_manager.REGIONS:
+        save_hour(db_manager, region, hour - HOUR)
+    # The client syncs after only the first region of the new hour was written
+    save_hour(db_manager, 'us', hour)
+    first = sync(db_manager, 0)
+    assert {region['region']: len(region['data']) for region in first['data']} == {'us': 2, 'eu': 1, 'kr': 1, 'tw': 1}
+
+    for region in ('eu', 'kr', 'tw'):
+        save_hour(db_manager, region, hour)
+    second = sync(db_manager, first['cursor'])
+    assert {region['region']: [document['timestamp'] for document in region['data']] for region in second['data']} == \
+        {'us': [], 'eu': [hour], 'kr': [hour], 'tw': [hour]}
+
+    third = sync(db_manager, second['cursor'])
+    assert all(region['data'] == [] for region in third['data'])
+    assert third['cursor'] == second['cursor']
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        parse_history_cursor('us:abc')
+    assert parse_history_cursor('123') == 123
@@ -0,0 +1,52 @@
+import gzip
+import json
+import os
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+from http_cassette import HttpCassette
+
+URL = 'https://us.api.blizzard.com/data/wow/auctions/commodities'
+
+def make_response(status_code, body, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = 'OK'
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = body
+    return response
+
+def read_recording(directory):
+    [name] = os.listdir(directory)
+    with open(os.path.join(directory, name), 'rb') as file:
+        metadata_line, body = gzip.decompress(file.read()).split(b'\n', 1)
+    return json.loads(metadata_line), body
+
+def test_replay_fails_once_recordings_are_used_up(tmp_path):
+    cassette = HttpCassette(str(tmp_path))
+    cassette.record('GET', URL, {'params': {'access_token': 'a'}}, make_response(200, b'{"auctions": []}'), 0.1)
+
+    replayer = HttpCassette(str(tmp_path))
+    response, duration = replayer.replay('GET', URL, {'params': {'access_token': 'b'}})
+    assert response.json() == {'auctions': []}
+    assert duration == 0.1
+    with pytest.raises(requests.ConnectionError):
+        replayer.replay('GET', URL, {'params': {'access_token': 'b'}})
+    with pytest.raises(requests.ConnectionError):
+        replayer.replay('GET', 'https://eu.api.blizzard.com/data/wow/token/index', {})
+
+def test_record_strips_sensitive_headers_and_issued_tokens(tmp_path):
+    cassette = HttpCassette(str(tmp_path))
+    headers = {'Set-Cookie': 'session=secret', 'content-length': '42', 'Last-Modified': 'Tue, 01 Oct 2024 10:00:00 GMT'}
+    cassette.record('POST', 'https://us.battle.net/oauth/token', {}, make_response(200, b'{"access_token": "issued", "expires_in": 86399}', headers), 0.2)
+
+    metadata, body = read_recording(str(tmp_path))
+    assert metadata['headers'] == {'Last-Modified': 'Tue, 01 Oct 2024 10:00:00 GMT'}
+    assert json.loads(body) == {'access_token': 'recorded', 'expires_in': 86399}
+
+def test_record_keeps_bodies_that_only_mention_access_token(tmp_path):
+    cassette = HttpCassette(str(tmp_path))
+    body = b'<html>"access_token" is missing</html>'
+    cassette.record('GET', URL, {}, make_response(200, body), 0.1)
+
+    assert read_recording(str(tmp_path))[1] == body
@@ -0,0 +1,29 @@
+import urllib.error
+import urllib.request
+import pytest
+import instrumentation
+
+@pytest.fixture
+def metrics_server():
+    server = instrumentation.start_metrics_server(0, {
+        '/metrics': ('text/plain; version=0.0.4', instrumentation.render_metrics),
+        '/api/status/jobs': ('application/json', lambda: '{"fetch_auction_data": {"runs": 1}}')
+    })
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_metrics_server_serves_the_registry(metrics_server):
+    instrumentation.record_job_run('test_job', True, 0.5, 3)
+
+    with urllib.request.urlopen(f"{metrics_server}/metrics") as response:
+        body = response.read().decode('utf-8')
+        assert response.headers['Content-Type'] == 'text/plain; version=0.0.4'
+    assert 'fyralath_job_runs_total{job="test_job",result="success"}' in body
+
+def test_metrics_server_serves_job_status_and_rejects_unknown_paths(metrics_server):
+    with urllib.request.urlopen(f"{metrics_server}/api/status/jobs") as response:
+        assert response.read() == b'{"fetch_auction_data": {"runs": 1}}'
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{metrics_server}/missing")
+    assert error.value.code == 404
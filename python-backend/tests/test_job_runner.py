@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+import threading
+import time
+import pytest
+import mongodb_manager
+from job_runner import JobRunner
+
+class FakeDBManager:
+    def __init__(self):
+        self.job_runs = []
+        self.renewals = []
+        self.lock = threading.Lock()
+
+    def acquire_job_lock(self, name, owner, lock_timeout):
+        return True
+
+    def renew_job_lock(self, name, owner, lock_timeout):
+        with self.lock:
+            self.renewals.append(name)
+        return True
+
+    def release_job_lock(self, name, owner):
+        pass
+
+    def save_job_run(self, document):
+        self.job_runs.append(document)
+
+    def get_last_successful_job_run(self, name):
+        runs = [run for run in self.job_runs if run['name'] == name and run['success']]
+        return max(runs, key=lambda run: run['started_at']) if runs else None
+
+    def get_last_job_run(self, name):
+        runs = [run for run in self.job_runs if run['name'] == name]
+        return max(runs, key=lambda run: run['started_at']) if runs else None
+
+def test_running_job_renews_its_lock():
+    db_manager = FakeDBManager()
+    runner = JobRunner(db_manager, lock_backend='mongo')
+    runner.register('slow', lambda: time.sleep(0.35), timedelta(hours=1), lock_timeout=timedelta(seconds=0.3))
+
+    runner.submit('slow').result()
+    renewals = len(db_manager.renewals)
+    time.sleep(0.2)
+
+    assert renewals >= 2
+    # The heartbeat stops with the job
+    assert len(db_manager.renewals) == renewals
+    runner.shutdown()
+
+def test_first_start_is_seeded_instead_of_caught_up():
+    db_manager = FakeDBManager()
+    calls = []
+    runner = JobRunner(db_manager)
+    runner.register('daily', lambda: calls.append(1), timedelta(days=1))
+
+    runner.catch_up()
+    runner.shutdown()
+
+    assert calls == []
+    assert db_manager.job_runs[0]['seeded']
+
+def test_missed_and_failed_runs_are_caught_up():
+    db_manager = FakeDBManager()
+    db_manager.save_job_run({'name': 'stale', 'started_at': datetime.utcnow() - timedelta(days=2), 'success': True})
+    db_manager.save_job_run({'name': 'failing', 'started_at': datetime.utcnow(), 'success': False})
+    calls = []
+    runner = JobRunner(db_manager)
+    runner.register('stale', lambda: calls.append('stale'), timedelta(days=1))
+    runner.register('failing', lambda: calls.append('failing'), timedelta(days=1))
+
+    runner.catch_up()
+    runner.shutdown()
+
+    assert sorted(calls) == ['failing', 'stale']
+
+def test_job_runs_are_indexed_and_expire(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_manager, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setenv('MONGODB_DB_NAME', 'test')
+    mongodb_manager.close_clients()
+    db_manager = mongodb_manager.MongoDBManager(workload='ingest')
+
+    db_manager.ensure_job_run_indexes(30)
+    db_manager.ensure_job_run_indexes(30)
+
+    indexes = {tuple(index['key'].items()): index for index in db_manager.db['job_runs'].list_indexes()}
+    assert (('name', 1), ('started_at', -1)) in indexes
+    assert indexes[(('started_at', 1),)]['expireAfterSeconds'] == 30 * 24 * 60 * 60
+    mongodb_manager.close_clients()
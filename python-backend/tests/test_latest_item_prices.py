@@ -0,0 +1,57 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+import mongodb_manager
+from mongodb_manager import CURRENT_SNAPSHOT_ID
+
+@pytest.fixture
+def db_manager(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_manager, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setenv('MONGODB_DB_NAME', 'test')
+    mongodb_manager.close_clients()
+    yield mongodb_manager.MongoDBManager()
+    mongodb_manager.close_clients()
+
+def save_prices(db_manager, timestamp, keep_snapshots=24):
+    return db_manager.save_latest_item_prices({'timestamp': timestamp, 'recipes': {'fyralath': []}}, keep_snapshots=keep_snapshots)
+
+def test_saved_prices_are_current_right_away(db_manager):
+    save_prices(db_manager, 1)
+    snapshot_id = save_prices(db_manager, 2)
+
+    latest = db_manager.get_latest_item_prices()
+    assert latest['_id'] == CURRENT_SNAPSHOT_ID
+    assert latest['snapshot_id'] == snapshot_id
+    assert latest['timestamp'] == 2
+
+def test_legacy_documents_are_removed(db_manager):
+    db_manager.db['latest_item_prices'].insert_one({'timestamp': 0, 'data': []})
+
+    save_prices(db_manager, 1)
+
+    assert [document['_id'] for document in db_manager.db['latest_item_prices'].find()] == [CURRENT_SNAPSHOT_ID]
+
+def test_only_the_newest_snapshots_are_kept(db_manager):
+    for timestamp in range(5):
+        save_prices(db_manager, timestamp, keep_snapshots=3)
+
+    assert sorted(snapshot['timestamp'] for snapshot in db_manager.db['item_price_snapshots'].find()) == [2, 3, 4]
+
+def test_rollback_steps_back_one_snapshot_at_a_time(db_manager):
+    snapshot_ids = [save_prices(db_manager, timestamp) for timestamp in range(3)]
+
+    assert db_manager.rollback_latest_item_prices() == snapshot_ids[1]
+    assert db_manager.get_latest_item_prices()['timestamp'] == 1
+    assert db_manager.rollback_latest_item_prices() == snapshot_ids[0]
+    assert db_manager.get_latest_item_prices()['timestamp'] == 0
+    # Nothing is older than the first snapshot
+    assert db_manager.rollback_latest_item_prices() is None
+    assert db_manager.get_latest_item_prices()['timestamp'] == 0
+
+def test_rollback_to_a_given_snapshot(db_manager):
+    snapshot_ids = [save_prices(db_manager, timestamp) for timestamp in range(3)]
+
+    assert db_manager.rollback_latest_item_prices(snapshot_ids[0]) == snapshot_ids[0]
+    assert db_manager.get_latest_item_prices()['snapshot_id'] == snapshot_ids[0]
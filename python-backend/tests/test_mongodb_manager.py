@@ -0,0 +1,58 @@
+import pytest
+
+import mongodb_manager
+
+class FakeClient:
+    def __init__(self, connection_string, fail_ping=False, **options):
+        self.connection_string = connection_string
+        self.options = options
+        self.fail_ping = fail_ping
+        self.closed = False
+        self.admin = self
+
+    def command(self, name):
+        if self.fail_ping:
+            raise mongodb_manager.ConnectionFailure("unreachable")
+
+    def __getitem__(self, name):
+        return {}
+
+    def close(self):
+        self.closed = True
+
+class CreatedClients(list):
+    """Every client the patched MongoClient created, fail_ping makes the next ones unreachable."""
+    fail_ping = False
+
+@pytest.fixture
+def created_clients(monkeypatch):
+    created = CreatedClients()
+    def create_client(*args, **kwargs):
+        created.append(FakeClient(*args, fail_ping=created.fail_ping, **kwargs))
+        return created[-1]
+    monkeypatch.setattr(mongodb_manager, 'MongoClient', create_client)
+    mongodb_manager.close_clients()
+    yield created
+    mongodb_manager.close_clients()
+
+def test_one_client_per_connection_string_and_workload(created_clients, monkeypatch):
+    monkeypatch.setenv('MONGODB_CONNECTION_STRING', 'mongodb://first')
+    api_managers = [mongodb_manager.MongoDBManager() for _ in range(5)]
+    ingest_managers = [mongodb_manager.MongoDBManager(workload='ingest') for _ in range(3)]
+    assert len(created_clients) == 2
+    assert all(manager.client is api_managers[0].client for manager in api_managers)
+    assert all(manager.client is ingest_managers[0].client for manager in ingest_managers)
+    assert api_managers[0].client.options['w'] == 1
+    assert ingest_managers[0].client.options['w'] == 'majority'
+
+    monkeypatch.setenv('MONGODB_CONNECTION_STRING', 'mongodb://second')
+    mongodb_manager.MongoDBManager()
+    mongodb_manager.MongoDBManager()
+    assert len(created_clients) == 3
+
+def test_failed_ping_closes_the_client(created_clients, monkeypatch):
+    created_clients.fail_ping = True
+    with pytest.raises(mongodb_manager.ConnectionFailure):
+        mongodb_manager.get_client()
+    assert created_clients[0].closed
+    assert mongodb_manager._clients == {}
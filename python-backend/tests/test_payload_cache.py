@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+from payload_cache import AsyncPayloadCache, PayloadCache
+
+def test_concurrent_misses_build_once():
+    cache = PayloadCache(ttl=60)
+    start = threading.Event()
+    calls = []
+
+    def builder():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'payload'
+
+    results = []
+    def request():
+        start.wait()
+        results.append(cache.get('current_data', builder))
+
+    threads = [threading.Thread(target=request) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['payload'] * 16
+
+def test_stale_hit_serves_old_payload_and_rebuilds_once():
+    cache = PayloadCache(ttl=0.01)
+    cache.set('current_data', 'old')
+    time.sleep(0.02)
+    rebuilt = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def builder():
+        calls.append(1)
+        release.wait()
+        rebuilt.set()
+        return 'new'
+
+    # Every stale hit during the rebuild gets the old payload without starting another rebuild
+    assert [cache.get('current_data', builder) for _ in range(5)] == ['old'] * 5
+    release.set()
+    assert rebuilt.wait(1)
+    cache.executor.shutdown(wait=True)
+
+    assert len(calls) == 1
+    assert cache.lookup('current_data')[0] == 'new'
+
+def test_wait_for_refresh_returns_once_the_rebuild_is_cached():
+    cache = PayloadCache(ttl=60)
+    cache.set('current_data', 'old')
+    release = threading.Event()
+
+    def builder():
+        release.wait(5)
+        return 'new'
+
+    future = cache.refresh('current_data', builder)
+    assert cache.refresh('current_data', builder) is future
+    threading.Timer(0.05, release.set).start()
+    cache.wait_for_refresh('current_data')
+
+    assert cache.lookup('current_data')[0] == 'new'
+    assert 'current_data' not in cache.refreshing
+
+def test_async_cache_evicts_least_recently_used_over_the_byte_limit():
+    cache = AsyncPayloadCache(ttl=60, max_bytes=10)
+
+    async def build(value):
+        return value
+
+    async def fill():
+        await cache.get('a', lambda: build('aaaa'))
+        await cache.get('b', lambda: build('bbbb'))
+        # Reading 'a' makes 'b' the least recently used entry
+        await cache.get('a', lambda: build('unused'))
+        await cache.get('c', lambda: build('cccc'))
+
+    asyncio.run(fill())
+
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.total_bytes == 8
@@ -0,0 +1,19 @@
+from payload_snapshot import PayloadSnapshot
+
+def test_only_payloads_of_the_current_version_are_loaded(tmp_path):
+    snapshot = PayloadSnapshot(str(tmp_path / 'payload_snapshot.json.gz'))
+    snapshot.save({
+        'prices': {'current_data_fyralath': ('v2', 'new current'), 'history_data_day_fyralath': ('v1', 'old history')},
+        'acquisitions': {'acquisition_data': ('a1', 'acquisitions')}
+    })
+
+    payloads, outdated_topics = snapshot.load({'prices': 'v2', 'acquisitions': 'a1'})
+
+    # A payload built before the latest prices is dropped and its topic rebuilt, the current one is served meanwhile
+    assert payloads == {'current_data_fyralath': ('v2', 'new current'), 'acquisition_data': ('a1', 'acquisitions')}
+    assert outdated_topics == {'prices'}
+
+def test_missing_snapshot_rebuilds_every_topic(tmp_path):
+    snapshot = PayloadSnapshot(str(tmp_path / 'missing.json.gz'))
+
+    assert snapshot.load({'prices': 'v1', 'acquisitions': None}) == ({}, {'prices', 'acquisitions'})
@@ -0,0 +1,44 @@
+import random
+import warnings
+import numpy as np
+from item_catalog import catalog
+from price_statistics import RollingPriceStatistics, get_sorted_mad, get_sorted_median
+
+def test_sorted_median_and_mad_match_numpy():
+    rng = random.Random(7)
+    for count in range(1, 40):
+        values = sorted(rng.choice([rng.uniform(0, 100), float(rng.randint(0, 5))]) for _ in range(count))
+        median = get_sorted_median(values)
+        assert median == np.median(values)
+        assert np.isclose(get_sorted_mad(values, median), np.median(np.abs(np.array(values) - median)))
+    assert np.isnan(get_sorted_median([]))
+    assert np.isnan(get_sorted_mad([], np.nan))
+
+def test_incremental_window_matches_full_recomputation():
+    statistics = RollingPriceStatistics(window_hours=6, min_samples=100)
+    rng = np.random.default_rng(3)
+    item_count = len(catalog.items)
+    for hour in range(20):
+        prices = rng.integers(100, 200, item_count)
+        found = rng.random(item_count) > 0.2
+        statistics.filter_prices('us', hour, prices, found)
+
+    state = statistics.regions['us']
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(state['window'], axis=1)
+        mad = np.nanmedian(np.abs(state['window'] - median[:, None]), axis=1)
+    assert np.array_equal(state['samples'], np.count_nonzero(~np.isnan(state['window']), axis=1))
+    assert np.allclose(state['median'], median, equal_nan=True)
+    assert np.allclose(state['mad'], mad, equal_nan=True)
+
+def test_restored_state_keeps_the_window_statistics():
+    statistics = RollingPriceStatistics(window_hours=4)
+    item_count = len(catalog.items)
+    for hour in range(6):
+        statistics.filter_prices('eu', hour, np.full(item_count, 100 + hour), np.ones(item_count, dtype=bool))
+
+    restored = RollingPriceStatistics(window_hours=4)
+    assert restored.load_document(statistics.to_document('eu'))
+    assert np.array_equal(restored.regions['eu']['median'], statistics.regions['eu']['median'])
+    assert np.array_equal(restored.regions['eu']['mad'], statistics.regions['eu']['mad'])
@@ -0,0 +1,35 @@
+import gzip
+import json
+import os
+import time
+from static_exporter import StaticExporter
+
+def test_export_writes_gzipped_aliases_and_a_utc_timestamp(tmp_path):
+    exporter = StaticExporter(str(tmp_path))
+    before = int(time.time() * 1000)
+
+    manifest = exporter.export({'current': '{"data": []}'})
+
+    entry = manifest['files']['current']
+    for name in (entry['file'], 'current.json'):
+        with open(tmp_path / name, 'rb') as file:
+            content = file.read()
+        with open(tmp_path / f"{name}.gz", 'rb') as file:
+            assert gzip.decompress(file.read()) == content == b'{"data": []}'
+    assert before <= manifest['generated_at'] <= int(time.time() * 1000)
+    with open(tmp_path / 'manifest.json', 'r', encoding='utf-8') as file:
+        assert json.load(file) == manifest
+
+def test_unchanged_payload_keeps_its_files(tmp_path):
+    exporter = StaticExporter(str(tmp_path))
+    exporter.export({'current': '{"data": []}'})
+    alias_gzip_path = tmp_path / 'current.json.gz'
+    os.utime(alias_gzip_path, (0, 0))
+
+    exporter.export({'current': '{"data": []}'})
+    assert os.stat(alias_gzip_path).st_mtime == 0
+
+    exporter.export({'current': '{"data": [1]}'})
+    assert os.stat(alias_gzip_path).st_mtime > 0
+    with open(alias_gzip_path, 'rb') as file:
+        assert gzip.decompress(file.read()) == b'{"data": [1]}'
@@ -0,0 +1,82 @@
+import time
+import pytest
+import mongodb_manager
+from mongodb_manager import recipe_collection_name
+from total_costs_compactor import build_day_bucket, expand_day_bucket, get_day_timestamp
+
+HOUR = 60 * 60 * 1000
+
+def test_bucket_round_trip_keeps_raw_prices():
+    documents = [
+        {'timestamp': 0, 'items': [{'name': "Fyr'alath", 'id': 1, 'price': 900}, {'name': 'Ore', 'id': 2, 'price': 10}]},
+        {'timestamp': HOUR, 'items': [{'name': "Fyr'alath", 'id': 1, 'price': 950}, {'name': 'Ore', 'id': 2, 'price': 12, 'raw_price': 99999}]},
+        {'timestamp': 2 * HOUR, 'items': [{'name': "Fyr'alath", 'id': 1, 'price': 940}]}
+    ]
+
+    bucket = build_day_bucket(0, documents)
+
+    assert 'raw_prices' not in bucket['items'][0]
+    assert expand_day_bucket(bucket) == documents
+
+@pytest.fixture
+def db_manager(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_manager, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setenv('MONGODB_DB_NAME', 'test')
+    mongodb_manager.close_clients()
+    yield mongodb_manager.MongoDBManager()
+    mongodb_manager.close_clients()
+
+def get_hours(count):
+    """Returns the timestamps of the last count full hours, oldest first."""
+    last_hour = get_day_timestamp(int(time.time() * 1000)) - HOUR
+    return [last_hour - hour * HOUR for hour in reversed(range(count))]
+
+def save_hours(db_manager, timestamps):
+    documents = [{'timestamp': timestamp, 'items': [{'name': "Fyr'alath", 'id': 1, 'price': timestamp // HOUR}]} for timestamp in timestamps]
+    db_manager.db[recipe_collection_name('total_costs', 'us')].insert_many(documents)
+
+def get_us_timestamps(history):
+    [us] = [region for region in history if region['region'] == 'us']
+    return [document['timestamp'] for document in us['data']]
+
+def test_history_reads_stitch_the_compacted_and_raw_tiers(db_manager):
+    hours = get_hours(480)
+    save_hours(db_manager, hours)
+
+    compacted = db_manager.compact_total_costs('us', raw_days=3)
+
+    raw_count = db_manager.db[recipe_collection_name('total_costs', 'us')].count_documents({})
+    assert compacted > 0 and raw_count == 480 - compacted
+    assert db_manager.db[recipe_collection_name('total_costs_daily', 'us')].count_documents({}) == compacted // 24
+    assert get_us_timestamps(db_manager.get_all_total_costs('all')) == hours
+    week_start = mongodb_manager.get_period_query('week')['timestamp']['$gte']
+    assert get_us_timestamps(db_manager.get_all_total_costs('week')) == [hour for hour in hours if hour >= week_start]
+    # A cursor from before the cutoff continues in the compacted tier
+    assert get_us_timestamps(db_manager.get_all_total_costs('all', since={'us': hours[10]})) == hours[11:]
+
+def test_late_hours_are_merged_into_an_existing_bucket(db_manager):
+    hours = get_hours(24 * 5)
+    late_hour = hours[5]
+    save_hours(db_manager, [hour for hour in hours if hour != late_hour])
+    db_manager.compact_total_costs('us', raw_days=2)
+
+    save_hours(db_manager, [late_hour])
+    db_manager.compact_total_costs('us', raw_days=2)
+
+    assert db_manager.db[recipe_collection_name('total_costs', 'us')].count_documents({'timestamp': late_hour}) == 0
+    assert get_us_timestamps(db_manager.get_all_total_costs('all')) == hours
+
+def test_interrupted_compaction_returns_every_hour_once(db_manager):
+    hours = get_hours(24 * 5)
+    save_hours(db_manager, hours)
+    # The bucket of the oldest day was written but its raw hours were not deleted yet
+    first_day = [hour for hour in hours if get_day_timestamp(hour) == get_day_timestamp(hours[0])]
+    raw_documents = list(db_manager.db[recipe_collection_name('total_costs', 'us')].find({'timestamp': {'$in': first_day}}, {'_id': 0}))
+    db_manager.db[recipe_collection_name('total_costs_daily', 'us')].insert_one(build_day_bucket(get_day_timestamp(hours[0]), raw_documents))
+
+    assert get_us_timestamps(db_manager.get_all_total_costs('all')) == hours
+
+    db_manager.compact_total_costs('us', raw_days=2)
+    assert get_us_timestamps(db_manager.get_all_total_costs('all')) == hours
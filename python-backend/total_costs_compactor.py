@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+import numpy as np
+
+DAY_MS = 24 * 60 * 60 * 1000
+# Packed prices use -1 for hours in which an item had no auctions
+MISSING_PRICE = -1
+
+def get_day_timestamp(timestamp):
+    """Returns the start of the UTC day of a millisecond timestamp."""
+    return timestamp - timestamp % DAY_MS
+
+def get_compaction_cutoff(raw_days, now=None):
+    """Returns the start of the UTC day raw_days ago, total costs before it are compacted."""
+    now = now or datetime.now(timezone.utc)
+    return get_day_timestamp(int(now.timestamp() * 1000)) - raw_days * DAY_MS
+
+def pack(values):
+    return np.asarray(values, dtype='<i8').tobytes()
+
+def unpack(data):
+    return np.frombuffer(data, dtype='<i8')
+
+def build_day_bucket(day_timestamp, documents):
+    """
+    Compacts one day of hourly total cost documents into a single bucket document.
+    The item names are stored once and every item's hourly prices are packed into an int64 array aligned with the timestamps.
+    Items with a winsorized price in any hour also get a packed array of their observed raw prices.
+    """
+    documents = sorted({document['timestamp']: document for document in documents}.values(), key=lambda document: document['timestamp'])
+    items = {}
+    for column, document in enumerate(documents):
+        for item in document['items']:
+            if item['id'] not in items:
+                items[item['id']] = {'id': item['id'], 'name': item['name'], 'prices': [MISSING_PRICE] * len(documents), 'raw_prices': None}
+            items[item['id']]['prices'][column] = item['price']
+            if 'raw_price' in item:
+                if items[item['id']]['raw_prices'] is None:
+                    items[item['id']]['raw_prices'] = [MISSING_PRICE] * len(documents)
+                items[item['id']]['raw_prices'][column] = item['raw_price']
+
+    bucket_items = []
+    for item in items.values():
+        bucket_item = {'id': item['id'], 'name': item['name'], 'prices': pack(item['prices'])}
+        if item['raw_prices'] is not None:
+            bucket_item['raw_prices'] = pack(item['raw_prices'])
+        bucket_items.append(bucket_item)
+    return {
+        'timestamp': day_timestamp,
+        'timestamps': pack([document['timestamp'] for document in documents]),
+        'items': bucket_items
+    }
+
+def expand_day_bucket(bucket):
+    """Turns a bucket document back into the hourly total cost documents it was built from."""
+    timestamps = unpack(bucket['timestamps']).tolist()
+    prices = [(item, unpack(item['prices']).tolist(), unpack(item['raw_prices']).tolist() if 'raw_prices' in item else None)
+              for item in bucket['items']]
+    documents = []
+    for column, timestamp in enumerate(timestamps):
+        hour_items = []
+        for item, item_prices, raw_prices in prices:
+            if item_prices[column] == MISSING_PRICE:
+                continue
+            hour_item = {'name': item['name'], 'id': item['id'], 'price': item_prices[column]}
+            if raw_prices is not None and raw_prices[column] != MISSING_PRICE:
+                hour_item['raw_price'] = raw_prices[column]
+            hour_items.append(hour_item)
+        documents.append({'timestamp': timestamp, 'items': hour_items})
+    return documents
+
+def get_bucket_query(query):
+    """Widens a timestamp query to the buckets whose day overlaps it."""
+    bounds = query.get('timestamp', {})
+    lower = max(bounds.get('$gte', 0), bounds.get('$gt', -1) + 1)
+    return {'timestamp': {'$gte': get_day_timestamp(lower)}} if lower > 0 else {}
+
+def matches_timestamp_query(timestamp, query):
+    bounds = query.get('timestamp', {})
+    return timestamp >= bounds.get('$gte', timestamp) and timestamp > bounds.get('$gt', timestamp - 1)
+
+def stitch_total_costs(buckets, raw_documents, query):
+    """
+    Combines the compacted and raw tiers into one list of hourly documents matching the query, oldest compacted hours first.
+    Hours present in both tiers, left behind by an interrupted compaction, are only returned once.
+    """
+    raw_timestamps = {document['timestamp'] for document in raw_documents}
+    compacted = [document for bucket in sorted(buckets, key=lambda bucket: bucket['timestamp']) for document in expand_day_bucket(bucket)
+                 if document['timestamp'] not in raw_timestamps and matches_timestamp_query(document['timestamp'], query)]
+    return compacted + raw_documents
@@ -0,0 +1,46 @@
+from urllib.parse import urlparse
+import os
+import time
+from dotenv import load_dotenv
+import requests
+import instrumentation
+from http_cassette import HttpCassette
+
+load_dotenv()
+# 'live' calls the upstream APIs, 'record' also saves every response to the cassette, 'replay' only serves saved responses
+mode = os.getenv('UPSTREAM_MODE', 'live')
+cassette = HttpCassette(os.getenv('UPSTREAM_CASSETTE_DIR', './cassettes')) if mode != 'live' else None
+# Replayed responses wait their recorded duration times this factor, 0 replays without any latency
+replay_latency = float(os.getenv('UPSTREAM_REPLAY_LATENCY', '1'))
+
+def configure(new_mode, cassette_dir=None, latency=1.0):
+    """Switches between live, record and replay mode, e.g. for benchmarks that replay a recorded pipeline run."""
+    global mode, cassette, replay_latency
+    mode = new_mode
+    cassette = HttpCassette(cassette_dir) if new_mode != 'live' else None
+    replay_latency = latency
+
+def request(method, url, **kwargs):
+    """Makes an upstream HTTP request, recording its status, size and duration."""
+    host = urlparse(url).hostname
+    with instrumentation.span('fetch'):
+        try:
+            if mode == 'replay':
+                response, duration = cassette.replay(method, url, kwargs)
+                time.sleep(duration * replay_latency)
+            else:
+                start_time = time.perf_counter()
+                response = requests.request(method, url, **kwargs)
+                if mode == 'record':
+                    cassette.record(method, url, kwargs, response, time.perf_counter() - start_time)
+        except requests.RequestException:
+            instrumentation.record_upstream_response(host, 'error', 0)
+            raise
+    instrumentation.record_upstream_response(host, response.status_code, len(response.content))
+    return response
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
@@ -48,11 +48,63 @@ document.addEventListener("DOMContentLoaded", async () => {
   });
 });
 
+// Set to the backend stream endpoint to receive price updates without polling
+const priceStreamUrl = null; // "https://backend.koodattu.dev/api/data/current/stream"
+let currentData = null;
+
 async function fetchDataAndDisplay() {
   // Example fetch function, replace URL with your actual data source
   //const response = await fetch("https://backend.koodattu.dev/api/data/current");
   const response = await fetch("./data/current.json");
   const data = await response.json();
+  displayData(data);
+
+  if (priceStreamUrl) {
+    subscribeToPriceUpdates();
+  }
+}
+
+function subscribeToPriceUpdates() {
+  const source = new EventSource(priceStreamUrl);
+  source.addEventListener("snapshot", (event) => displayData(JSON.parse(event.data)));
+  source.addEventListener("diff", (event) => {
+    // A stream that started before any prices existed receives the first prices as added regions
+    displayData(applyPriceDiff(currentData || { data: [] }, JSON.parse(event.data)));
+  });
+}
+
+// Applies the changed, added and removed prices, regions and token ratios of a diff event to the current data
+function applyPriceDiff(data, diff) {
+  data.timestamp = diff.timestamp;
+  const removedRegions = diff.removed_regions || [];
+  data.data = data.data.filter((region) => !removedRegions.includes(region.region));
+  data.data.forEach((region) => {
+    const changes = diff.regions[region.region];
+    if (!changes) {
+      return;
+    }
+    if ("wow_token_ratio" in changes) {
+      region.wow_token_ratio = changes.wow_token_ratio;
+    }
+    const removedItems = changes.removed_items || [];
+    region.items = region.items.filter((item) => !removedItems.includes(item.id));
+    region.items.forEach((item) => {
+      if (changes.items && item.id in changes.items) {
+        item.price = changes.items[item.id];
+      }
+    });
+    region.items = region.items.concat(changes.added_items || []);
+  });
+  Object.values(diff.regions).forEach((changes) => {
+    if (changes.region) {
+      data.data.push(changes.region);
+    }
+  });
+  return data;
+}
+
+function displayData(data) {
+  currentData = data;
 
   // Update the timestamp display
   document.getElementById("timestamp").textContent = formatTimestamp(data.timestamp);